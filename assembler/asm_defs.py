@@ -71,12 +71,42 @@ assembler's header, while for others emitted an argument of type depending on
 argument's class.
 """
 
-import copy
+import functools
 import json
+import operator
+import sys
+
+# orjson is much faster than json, but it's not always available, e.g. when
+# the script is run by the build system's own Python.
+try:
+  import orjson
+except ImportError:
+  orjson = None
+
+
+_IMM_CLASSES = frozenset(('Imm2', 'Imm8', 'Imm16', 'Imm32', 'Imm64'))
+
+_MEM_OP_CLASSES = frozenset(('Mem8', 'Mem16', 'Mem32', 'Mem64', 'Mem128',
+                             'MemX87', 'MemX8716', 'MemX8732', 'MemX8764', 'MemX8780',
+                             'VecMem32', 'VecMem64', 'VecMem128'))
+
+_GREG_CLASSES = frozenset(('GeneralReg',
+                           'GeneralReg8', 'GeneralReg16',
+                           'GeneralReg32', 'GeneralReg64'))
+
+_XREG_CLASSES = frozenset(('XmmReg',
+                           'VecReg64', 'VecReg128',
+                           'FpReg32', 'FpReg64'))
+
+_IMPLICIT_REG_CLASSES = frozenset(('RAX', 'EAX', 'AX', 'AL',
+                                   'RCX', 'ECX', 'CL', 'ST', 'ST1',
+                                   'RDX', 'EDX', 'DX', 'CC',
+                                   'RBX', 'EBX', 'BX', 'SW',
+                                   'RDI', 'RSI', 'RSP', 'FLAGS'))
 
 
 def is_imm(arg_type):
-  return arg_type in ('Imm2', 'Imm8', 'Imm16', 'Imm32', 'Imm64')
+  return arg_type in _IMM_CLASSES
 
 
 def is_disp(arg_type):
@@ -84,9 +114,7 @@ def is_disp(arg_type):
 
 
 def is_mem_op(arg_type):
-  return arg_type in ('Mem8', 'Mem16', 'Mem32', 'Mem64', 'Mem128',
-                      'MemX87', 'MemX8716', 'MemX8732', 'MemX8764', 'MemX8780',
-                      'VecMem32', 'VecMem64', 'VecMem128')
+  return arg_type in _MEM_OP_CLASSES
 
 
 def is_cond(arg_type):
@@ -102,24 +130,16 @@ def is_x87reg(arg_type):
 
 
 def is_greg(arg_type):
-  return arg_type in ('GeneralReg',
-                      'GeneralReg8', 'GeneralReg16',
-                      'GeneralReg32', 'GeneralReg64')
+  return arg_type in _GREG_CLASSES
 
 
 def is_xreg(arg_type):
-  return arg_type in ('XmmReg',
-                      'VecReg64', 'VecReg128',
-                      'FpReg32', 'FpReg64')
+  return arg_type in _XREG_CLASSES
 
 
 # Operands of this type are NOT passed to assembler
 def is_implicit_reg(arg_type):
-  return arg_type in ('RAX', 'EAX', 'AX', 'AL',
-                      'RCX', 'ECX', 'CL', 'ST', 'ST1',
-                      'RDX', 'EDX', 'DX', 'CC',
-                      'RBX', 'EBX', 'BX', 'SW',
-                      'RDI', 'RSI', 'RSP', 'FLAGS')
+  return arg_type in _IMPLICIT_REG_CLASSES
 
 
 def exactly_one_of(iterable):
@@ -130,35 +150,64 @@ def get_mem_macro_name(insn, addr_mode = None):
   macro_name = insn.get('asm')
   if macro_name.endswith('ByCl'):
     macro_name = macro_name[:-4]
-  for arg in insn['args']:
-    clazz = arg['class']
+  return macro_name + _get_mem_macro_suffix(
+      tuple(arg['class'] for arg in insn['args']), addr_mode)
+
+
+# There are only few distinct argument lists, while get_mem_macro_name is
+# called several times for each instruction.
+@functools.lru_cache(maxsize=None)
+def _get_mem_macro_suffix(arg_classes, addr_mode):
+  parts = []
+  for clazz in arg_classes:
     # Don't reflect FLAGS or Conditions or Labels in the name - we don't ever
     # have two different instructions where these cause the difference.
     if clazz == 'FLAGS' or is_cond(clazz) or is_label(clazz):
       pass
     elif is_x87reg(clazz) or is_greg(clazz) or is_implicit_reg(clazz):
-      macro_name += 'Reg'
+      parts.append('Reg')
     elif is_xreg(clazz):
-      macro_name += 'XReg'
+      parts.append('XReg')
     elif is_imm(clazz):
-      macro_name += 'Imm'
+      parts.append('Imm')
     elif is_mem_op(clazz):
       if addr_mode is not None:
-        macro_name += 'Mem' + addr_mode
+        parts.append('Mem' + addr_mode)
       else:
-        macro_name += 'Op'
+        parts.append('Op')
     else:
       raise Exception('arg type %s is not supported' % clazz)
-  return macro_name
+  return ''.join(parts)
+
+
+def _clone_insn(insn):
+  # Instruction is a dict of scalars, lists and dicts, while 'args' is a list
+  # of small dicts.  That is much cheaper to copy by hand than with
+  # copy.deepcopy.
+  #
+  # Only args are copied deeper than one level: values of nested dicts (e.g.
+  # per-stem 'encodings' entries and their 'opcodes') are shared between
+  # clones and must not be modified.
+  clone = {}
+  for key, value in insn.items():
+    if key == 'args':
+      value = [dict(arg) for arg in value]
+    elif isinstance(value, dict):
+      value = dict(value)
+    elif isinstance(value, list):
+      value = list(value)
+    clone[key] = value
+  return clone
 
 
 def _expand_name(insn, stem, encoding = {}):
-  # Make deep copy of the instruction to make sure consumers could treat them
-  # as independent entities and add/remove marks freely.
+  # Make copy of the instruction to make sure consumers could treat them
+  # as independent entities and add/remove marks freely (at the top level and
+  # in args, see _clone_insn).
   #
   # JSON never have "merged" objects thus having them in result violates
   # expectations.
-  expanded_insn = copy.deepcopy(insn)
+  expanded_insn = _clone_insn(insn)
   expanded_insn['asm'] = stem
   expanded_insn['name'] = get_mem_macro_name(expanded_insn)
   expanded_insn['mnemo'] = stem.upper()
@@ -189,13 +238,13 @@ def _expand_insns_by_operands(insns):
   expanded_insns = []
   for insn in insns:
     split_done = False
-    for arg in insn['args']:
+    for arg_nr, arg in enumerate(insn['args']):
       if '/' in arg['class']:
         assert not split_done
         operand_classes = arg['class'].split('/')
         for subclass in operand_classes:
-          arg['class'] = subclass
-          expanded_insn = copy.deepcopy(insn)
+          expanded_insn = _clone_insn(insn)
+          expanded_insn['args'][arg_nr]['class'] = subclass
           expanded_insns.append(expanded_insn)
         split_done = True
     if not split_done:
@@ -203,13 +252,33 @@ def _expand_insns_by_operands(insns):
   return expanded_insns
 
 
+def _intern_arg_strings(insns):
+  # There are only few distinct argument classes and usages, but JSON parser
+  # creates new string for each occurrence.  Interned strings are shared and
+  # compared by identity first, which speeds up lookups by class.
+  for insn in insns:
+    for arg in insn['args']:
+      arg['class'] = sys.intern(arg['class'])
+      if 'usage' in arg:
+        arg['usage'] = sys.intern(arg['usage'])
+
+
+def load_json(file_name):
+  if orjson is not None:
+    with open(file_name, 'rb') as f:
+      return orjson.loads(f.read())
+  with open(file_name) as f:
+    return json.load(f)
+
+
 def load_asm_defs(asm_def):
   result = []
-  with open(asm_def) as asm:
-    obj = json.load(asm)
-    insns = obj.get('insns')
-    insns = _expand_insns_by_operands(insns)
-    insns = _expand_insn_by_encodings(insns)
-    insns = sorted(insns, key=lambda i: i.get('asm'))
-    result.extend(insns)
+  obj = load_json(asm_def)
+  insns = obj.get('insns')
+  insns = _expand_insns_by_operands(insns)
+  insns = _expand_insn_by_encodings(insns)
+  _intern_arg_strings(insns)
+  # All instructions have 'asm' after expansion.
+  insns.sort(key=operator.itemgetter('asm'))
+  result.extend(insns)
   return obj.get('arch'), result
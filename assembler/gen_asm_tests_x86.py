@@ -15,8 +15,15 @@
 # limitations under the License.
 #
 
+import asm_defs
+import concurrent.futures
+import contextlib
+import functools
+import io
 import itertools
-import json
+import math
+import os
+import random
 import sys
 
 import gen_asm_x86
@@ -25,12 +32,39 @@ import gen_asm_x86
 # Enable to avoid cycles.  Only use one register combo for tests.
 fast_mode = False
 
+# Enable to only test each pair of values of any two arguments instead of all
+# combinations of arguments.
+pairwise_mode = False
+
+# Set to only test given number of randomly chosen combinations of arguments
+# (plus enough to use each value of each argument at least once).
+sample_count = None
+
+# Random samples have to be reproducible.
+_SAMPLE_SEED = 0
+
+# Tests produce hundreds of megabytes of text, use large output buffers.
+_OUTPUT_BUFFER_SIZE = 1 << 20
+
+# Padding emitted around instructions with labels.
+_NOP_BLOCK_256 = '.rept 256\nnop\n.endr\n'
+
+# Stands for instruction name in memoized ARC tests.
+_ARC_NAME_PLACEHOLDER = '@ARC_NAME@'
+
+# Indentation of nested loops in generated C++ code.
+_INDENTS = tuple(' ' * (2 * level) for level in range(16))
+
+# Number of instructions sent to worker process at once.
+_WORKER_CHUNK_SIZE = 16
+
 
 def main(argv):
   # Usage: gen_asm.tests_py <assembler_ref.S>
   #                         <assembler_test.cc>
   #                         <def_common>
   #                         <def_arch>
+  #                         [--fast] [--pairwise] [--sample=K]
   att_assembler_file_name = argv[1]
   arc_assembler_file_name = argv[2]
   # Generate empty files if we don't have assembler files to test.
@@ -44,37 +78,62 @@ def main(argv):
   arch_defs = gen_asm_x86._load_asm_defs(argv[4])
 
   fast_mode = globals()["fast_mode"]
-  if len(argv) > 5 and argv[5] == '--fast':
-    fast_mode = True
-
-  with open(argv[4]) as arch_def:
-    obj = json.load(arch_def)
-    arch = obj.get('arch')
-    assert arch in ('x86_32', 'x86_64')
-    _update_arguments(arch == 'x86_64')
-
-  with open(att_assembler_file_name, 'w') as att_assembler_file:
-    print('.globl berberis_gnu_as_output_start_%s' % arch,
-          file=att_assembler_file)
-    print('.globl berberis_gnu_as_output_end_%s' % arch,
-          file=att_assembler_file)
-    print('.data', file=att_assembler_file)
-    print('berberis_gnu_as_output_start_%s:' % arch,
-          file=att_assembler_file)
-    print('.code%d' % (32 if arch == 'x86_32' else 64), file=att_assembler_file)
-    _gen_att_assembler(att_assembler_file, common_defs, fast_mode)
-    _gen_att_assembler(att_assembler_file, arch_defs, fast_mode)
-    print('berberis_gnu_as_output_end_%s:' % arch, file=att_assembler_file)
-
-  with open(arc_assembler_file_name, 'w') as arc_assembler_file:
-    print('#include "berberis/assembler/%s.h"' % (arch), file=arc_assembler_file)
-    print('namespace berberis {', file=arc_assembler_file)
-    print('namespace %s {' % (arch), file=arc_assembler_file)
+  pairwise_mode = globals()["pairwise_mode"]
+  sample_count = globals()["sample_count"]
+  for option in argv[5:]:
+    if option == '--fast':
+      fast_mode = True
+    elif option == '--pairwise':
+      pairwise_mode = True
+    elif option.startswith('--sample='):
+      sample_count = int(option[len('--sample='):])
+      assert sample_count > 0, 'invalid option %s' % (option)
+    else:
+      assert False, 'unknown option %s' % (option)
+  assert not (pairwise_mode and sample_count), (
+      '--pairwise and --sample are mutually exclusive')
+
+  arch = asm_defs.load_json(argv[4]).get('arch')
+  assert arch in ('x86_32', 'x86_64')
+  _update_arguments(arch == 'x86_64')
+
+  with contextlib.ExitStack() as stack:
+    # Instructions are independent, generate their tests in parallel.  Fast
+    # mode does too little per instruction to pay for the worker processes.
+    map_insns = map
+    if ((not fast_mode or pairwise_mode or sample_count) and
+        (os.cpu_count() or 1) > 1):
+      executor = stack.enter_context(concurrent.futures.ProcessPoolExecutor(
+          initializer=_update_arguments, initargs=(arch == 'x86_64',)))
+      map_insns = functools.partial(
+          executor.map, chunksize=_WORKER_CHUNK_SIZE)
+    # Output is plain ASCII: write bytes to skip text layer overhead.
+    att_assembler_file = stack.enter_context(open(
+        att_assembler_file_name, 'wb', buffering=_OUTPUT_BUFFER_SIZE))
+    arc_assembler_file = stack.enter_context(open(
+        arc_assembler_file_name, 'wb', buffering=_OUTPUT_BUFFER_SIZE))
+    _write_lines(att_assembler_file, [
+        '.globl berberis_gnu_as_output_start_%s' % arch,
+        '.globl berberis_gnu_as_output_end_%s' % arch,
+        '.data',
+        'berberis_gnu_as_output_start_%s:' % arch,
+        '.code%d' % (32 if arch == 'x86_32' else 64)])
+    _write_lines(arc_assembler_file, [
+        '#include "berberis/assembler/%s.h"' % (arch),
+        'namespace berberis {',
+        'namespace %s {' % (arch)])
     _gen_arc_generators(arc_assembler_file)
-    _gen_arc_assembler(arc_assembler_file, 'Common', common_defs, fast_mode)
-    _gen_arc_assembler(arc_assembler_file, 'Arch', arch_defs, fast_mode)
-    print('}  // namespace %s' % (arch), file=arc_assembler_file)
-    print('}  // namespace berberis', file=arc_assembler_file)
+    _gen_assemblers(att_assembler_file, arc_assembler_file, 'Common',
+                    common_defs, fast_mode, pairwise_mode, sample_count,
+                    map_insns)
+    _gen_assemblers(att_assembler_file, arc_assembler_file, 'Arch',
+                    arch_defs, fast_mode, pairwise_mode, sample_count,
+                    map_insns)
+    _write_lines(att_assembler_file,
+                 ['berberis_gnu_as_output_end_%s:' % arch])
+    _write_lines(arc_assembler_file, [
+        '}  // namespace %s' % (arch),
+        '}  // namespace berberis'])
   return 0
 
 
@@ -136,6 +195,9 @@ sample_att_arguments_x86_64 = {
     'Label': ('0b', '1b', '2f'),
 }
 
+# Operands of indirect jumps and calls, filled by _update_arguments.
+indirect_att_arguments = {}
+
 sample_arc_arguments = {
     # Note: st(0) is not tested on purpose: many instructions have ambiguity
     # where st(0) to st(0) version can be encoded in two different ways and both
@@ -175,6 +237,8 @@ gp_registers_64 = ('Assembler::rcx', 'Assembler::rdx',
                    'Assembler::r13', 'Assembler::r14',
                    'Assembler::r15', 'Assembler::rax',)
 
+_GP_REGISTERS = frozenset(gp_registers_32 + gp_registers_64)
+
 sample_arc_arguments_x86_32 = {
     # Note: have to match sample_att_arguments_x86_32.
     # Read comment there about why accumulator is last.
@@ -216,13 +280,54 @@ MNEMO_TO_ASM = {
     'VCVTTPD2DQ': 'VCVTTPD2DQX'
 }
 
-FIXED_REGISTER_CLASSES = (
+FIXED_REGISTER_CLASSES = frozenset((
     'AL', 'AX', 'EAX', 'RAX',
     'CL', 'ECX', 'RCX', 'ST', 'ST1',
     'DX', 'EDX', 'RDX', 'CC',
     'BX', 'EBX', 'RBX', 'SW',
     'EBP', 'RSP', 'FLAGS'
-)
+))
+
+MEM_ARG_CLASSES = (
+    'Mem8', 'Mem16', 'Mem32', 'Mem64', 'Mem128',
+    'MemX87', 'MemX8716', 'MemX8732', 'MemX8764', 'MemX8780',
+    'VecMem32', 'VecMem64', 'VecMem128')
+
+_HIGH_GP_REGISTERS_64 = frozenset((
+    '%R8', '%R9', '%R10', '%R11', '%R12', '%R13', '%R14', '%R15'))
+
+ACCUMULATOR_CLASSES = frozenset(('AL', 'AX', 'EAX', 'RAX'))
+
+# Suffixes of ARC names which have to be removed from mnemonic to get AT&T
+# instruction name.
+ARC_NAME_SUFFIXES = {
+    'ByOne': 'BYONE',
+    'Imm2': 'IMM2',
+    'Imm8': 'IMM8',
+    'Accumulator': 'ACCUMULATOR',
+    'ByCl': 'BYCL',
+    'FromSt': 'FROMST',
+    'ToSt': 'TOST',
+}
+
+# Shifts and rotates are tested without the first sample immediate.
+SHIFT_IMM_INSNS = frozenset((
+    'PSLLW', 'PSRAW', 'PSRLW', 'PSLLD', 'PSRAD', 'PSRLD',
+    'PSLLQ', 'PSRLQ', 'PSLLDQ', 'PSRLDQ',
+    'RCLB', 'RCLW', 'RCLL', 'RCLQ', 'RCRB', 'RCRW', 'RCRL', 'RCRQ',
+    'ROLB', 'ROLW', 'ROLL', 'ROLQ', 'RORB', 'RORW', 'RORL', 'RORQ',
+    'SHLB', 'SHLW', 'SHLL', 'SHLQ', 'SHRB', 'SHRW', 'SHRL', 'SHRQ',
+    'SARB', 'SARW', 'SARL', 'SARQ', 'BTCB', 'BTCW', 'BTCL', 'BTCQ'))
+
+# ARC names of the same instructions.
+SHIFT_IMM_ARC_INSNS = frozenset(name.capitalize() for name in SHIFT_IMM_INSNS)
+
+# GNU disassembler accepts these instructions, but not Clang assembler.
+CLANG_UNSUPPORTED_INSNS = {
+    'FNDISI': '.byte 0xdb, 0xe1',
+    'FNENI': '.byte 0xdb, 0xe0',
+    'FNSETPM': '.byte 0xdb, 0xe4',
+}
 
 
 def _update_arguments(x86_64):
@@ -236,134 +341,150 @@ def _update_arguments(x86_64):
     sample_arc_arguments_add = sample_arc_arguments_x86_32
   for key, values in sample_arc_arguments_add.items():
     sample_arc_arguments[key] = values
+  # Stack pointer can not be used as index.
+  regs = sample_att_arguments[addr]
+  index_regs = tuple(reg for reg in regs if reg not in ('%ESP', '%RSP'))
   addrs = ['0']
-  addrs += ['(%s)' % reg for reg in sample_att_arguments[addr]]
-  addrs += ['%s(,%s%s)' % (offset, index, scale)
+  addrs += ['(%s)' % reg for reg in regs]
+  addrs += [''.join((offset, '(,', index, scale, ')'))
             for offset in ('', '64', '32768')
-            for index in sample_att_arguments[addr]
-            for scale in ('', ',2', ',4', ',8')
-            if index not in ('%ESP', '%RSP')]
-  addrs += ['%s(%s,%s%s)' % (offset, base, index, scale)
+            for index in index_regs
+            for scale in ('', ',2', ',4', ',8')]
+  addrs += [''.join((offset, '(', base, ',', index, scale, ')'))
             for offset in ('', '64', '32768')
-            for base in sample_att_arguments[addr]
-            for index in sample_att_arguments[addr]
-            for scale in ('', ',2', ',4', ',8')
-            if index not in ('%ESP', '%RSP')]
-  for mem_arg in ('Mem8', 'Mem16', 'Mem32', 'Mem64', 'Mem128',
-                  'MemX87', 'MemX8716', 'MemX8732', 'MemX8764', 'MemX8780',
-                  'VecMem32', 'VecMem64', 'VecMem128'):
-    sample_att_arguments[mem_arg] = tuple(addrs)
+            for base in regs
+            for index in index_regs
+            for scale in ('', ',2', ',4', ',8')]
+  # All memory operands share the same (read-only) tuple of samples.
+  addrs = tuple(addrs)
+  for mem_arg in MEM_ARG_CLASSES:
+    sample_att_arguments[mem_arg] = addrs
 
   sample_att_arguments['GeneralReg'] = sample_att_arguments[addr]
-
-  def peel_constructor(s):
-    return s.split('(', 1)[1][:-1] if '(' in s else s
-
+  for arg_class in ('GeneralReg', 'Mem32', 'VecMem64'):
+    indirect_att_arguments[arg_class] = tuple(
+        '*%s' % arg for arg in sample_att_arguments[arg_class])
+
+  regs = sample_arc_arguments[addr]
+  index_regs = tuple(
+      reg for reg in regs
+      if 'Assembler::esp' not in reg and 'Assembler::rsp' not in reg)
+  # Register names without constructor wrapper, if there is any.
+  peeled = {reg: reg.split('(', 1)[1][:-1] if '(' in reg else reg
+            for reg in regs}
   addrs = ['Assembler::Operand()']
-  addrs += ['{.base = %s}' % peel_constructor(reg)
-            for reg in sample_arc_arguments[addr]]
-  addrs += ['{.index = %s, .scale = Assembler::kTimes%s, .disp = %d}' %
-            (peel_constructor(index), scale, disp)
-            for disp in (0, 64, 32768)
-            for index in sample_arc_arguments[addr]
-            for scale in ('One', 'Two', 'Four', 'Eight')
-            if 'Assembler::esp' not in index and 'Assembler::rsp' not in index]
-  addrs += ['{.base = %s, .index = %s, .scale = Assembler::kTimes%s, .disp = %d}' %
-            (peel_constructor(base), peel_constructor(index), scale, disp)
-            for disp in (0, 64, 32768)
-            for base in sample_arc_arguments[addr]
-            for index in sample_arc_arguments[addr]
-            for scale in ('One', 'Two', 'Four', 'Eight')
-            if 'Assembler::esp' not in index and 'Assembler::rsp' not in index]
-  for mem_arg in ('Mem8', 'Mem16', 'Mem32', 'Mem64', 'Mem128',
-                  'MemX87', 'MemX8716', 'MemX8732', 'MemX8764', 'MemX8780',
-                  'VecMem32', 'VecMem64', 'VecMem128'):
-    sample_arc_arguments[mem_arg] = tuple(addrs)
+  addrs += ['{.base = %s}' % peeled[reg] for reg in regs]
+  addrs += [''.join(('{.index = ', peeled[index],
+                     ', .scale = Assembler::kTimes', scale,
+                     ', .disp = ', disp, '}'))
+            for disp in ('0', '64', '32768')
+            for index in index_regs
+            for scale in ('One', 'Two', 'Four', 'Eight')]
+  addrs += [''.join(('{.base = ', peeled[base],
+                     ', .index = ', peeled[index],
+                     ', .scale = Assembler::kTimes', scale,
+                     ', .disp = ', disp, '}'))
+            for disp in ('0', '64', '32768')
+            for base in regs
+            for index in index_regs
+            for scale in ('One', 'Two', 'Four', 'Eight')]
+  addrs = tuple(addrs)
+  for mem_arg in MEM_ARG_CLASSES:
+    sample_arc_arguments[mem_arg] = addrs
 
   sample_arc_arguments['GeneralReg'] = sample_arc_arguments[addr]
+  _argument_class_to_arc_type.cache_clear()
 
 
-def _gen_att_assembler(file, insns, fast_mode):
-  for insn in insns:
-    arc_name = insn['asm']
-    insn_name = insn['mnemo']
-    if len(insn['args']) and insn['args'][0]['class'] == 'Cond':
-      if insn_name in ('CMOVW', 'CMOVL', 'CMOVQ'):
-        insn_name = 'CMOV'
-      else:
-        assert insn_name.endswith('CC')
-        insn_name = insn_name[:-2]
-      for insn_suffix in ('O', 'NO', 'B', 'AE', 'E', 'NE', 'BE', 'A',
-                          'S', 'NS', 'P', 'NP', 'L', 'GE', 'LE', 'G'):
-        _gen_att_instruction_variants(
-            file, arc_name, insn_name + insn_suffix, insn['args'], fast_mode)
-    elif arc_name == 'Call' and insn['args'][1]['class'] != 'Label':
-      _gen_att_call_variants(file, insn['args'], fast_mode)
+# Generates tests for both assemblers in one pass over instructions.
+def _gen_assemblers(att_file, arc_file, insn_kind, insns, fast_mode,
+                    pairwise_mode, sample_count=None, map_insns=map):
+  for att_text, arc_text in map_insns(
+      functools.partial(
+          _gen_insn_tests, fast_mode=fast_mode, pairwise_mode=pairwise_mode,
+          sample_count=sample_count),
+      insns):
+    att_file.write(att_text)
+    arc_file.write(arc_text)
+  _gen_arc_insns_function(arc_file, insn_kind, insns)
+
+
+def _gen_insn_tests(insn, fast_mode, pairwise_mode, sample_count=None):
+  return (
+      _gen_att_insn(insn, fast_mode, pairwise_mode, sample_count).encode(),
+      _gen_arc_insn(insn, fast_mode, pairwise_mode, sample_count).encode())
+
+
+def _write_lines(file, lines):
+  file.write(''.join(line + '\n' for line in lines).encode())
+
+
+def _gen_att_insn(insn, fast_mode, pairwise_mode, sample_count=None):
+  file = io.StringIO()
+  arc_name = insn['asm']
+  insn_name = insn['mnemo']
+  if len(insn['args']) and insn['args'][0]['class'] == 'Cond':
+    if insn_name in ('CMOVW', 'CMOVL', 'CMOVQ'):
+      insn_name = 'CMOV'
     else:
+      assert insn_name.endswith('CC')
+      insn_name = insn_name[:-2]
+    for insn_suffix in ('O', 'NO', 'B', 'AE', 'E', 'NE', 'BE', 'A',
+                        'S', 'NS', 'P', 'NP', 'L', 'GE', 'LE', 'G'):
       _gen_att_instruction_variants(
-          file, arc_name, insn_name, insn['args'], fast_mode)
+          file, arc_name, insn_name + insn_suffix, insn['args'], fast_mode,
+          pairwise_mode, sample_count)
+  elif arc_name == 'Call' and insn['args'][1]['class'] != 'Label':
+    _gen_att_call_variants(file, insn['args'], fast_mode)
+  else:
+    _gen_att_instruction_variants(
+        file, arc_name, insn_name, insn['args'], fast_mode, pairwise_mode,
+        sample_count)
+  return file.getvalue()
 
 
 def _gen_att_instruction_variants(
-    file, arc_name, insn_name, insn_args, fast_mode):
-  if insn_name in MNEMO_TO_ASM:
-    insn_name = MNEMO_TO_ASM[insn_name]
+    file, arc_name, insn_name, insn_args, fast_mode, pairwise_mode,
+    sample_count=None):
+  insn_name = MNEMO_TO_ASM.get(insn_name, insn_name)
   insn_sample_args = []
   label_present = False
-  if arc_name.endswith('ByOne'):
-    assert insn_name.endswith('BYONE')
-    insn_name = insn_name[:-5]
-  elif arc_name.endswith('Imm2'):
-    assert insn_name.endswith('IMM2')
-    insn_name = insn_name[:-4]
-  elif arc_name.endswith('Imm8'):
-    assert insn_name.endswith('IMM8')
-    insn_name = insn_name[:-4]
-  elif arc_name.endswith('Accumulator'):
-    assert insn_name.endswith('ACCUMULATOR')
-    insn_name = insn_name[:-11]
-  elif arc_name.endswith('ByCl'):
-    assert insn_name.endswith('BYCL')
-    insn_name = insn_name[:-4]
-  elif arc_name.endswith('FromSt'):
-    assert insn_name.endswith('FROMST')
-    insn_name = insn_name[:-6]
-  elif arc_name.endswith('ToSt'):
-    assert insn_name.endswith('TOST')
-    insn_name = insn_name[:-4]
+  arc_suffix = _get_arc_name_suffix(arc_name)
+  if arc_suffix:
+    mnemo_suffix = ARC_NAME_SUFFIXES[arc_suffix]
+    assert insn_name.endswith(mnemo_suffix)
+    insn_name = insn_name[:-len(mnemo_suffix)]
+  # Note: arguments from FIXED_REGISTER_CLASSES are implicit in AT&T assembler
+  # (except for accumulator, CL and ST in some instructions).  Skip them.
+  explicit_fixed_args = {}
+  if arc_suffix == 'Accumulator' or arc_name == "Fnstsw":
+    explicit_fixed_args.update(
+        (arg_class, ('%%%s' % arg_class,)) for arg_class in ACCUMULATOR_CLASSES)
+  elif arc_suffix == 'ByCl':
+    explicit_fixed_args['CL'] = ('%CL',)
+  elif arc_suffix in ('FromSt', 'ToSt'):
+    explicit_fixed_args['ST'] = ('%ST',)
   for arg_nr, insn_arg in enumerate(insn_args):
     arg_class = insn_arg['class']
     if arg_class == 'Cond':
       # This argument was already embedded into the name of instruction.
       continue
-    if arg_class == 'Label':
+    if arg_class in FIXED_REGISTER_CLASSES:
+      if arg_class not in explicit_fixed_args:
+        continue
+      arg_variants = explicit_fixed_args[arg_class]
+    elif arg_class == 'Label':
       label_present = True
-    if arg_class in ('AL', 'AX', 'EAX', 'RAX') and (
-       arc_name.endswith('Accumulator') or arc_name == "Fnstsw"):
-      arg_variants = ('%%%s' % arg_class,)
-    elif arg_class == 'CL' and arc_name.endswith('ByCl'):
-      arg_variants = ('%CL',)
-    elif arg_class == 'ST' and (arc_name.endswith('FromSt') or arc_name.endswith('ToSt')):
-      arg_variants = ('%ST',)
+      arg_variants = sample_att_arguments[arg_class]
     elif arg_class == 'GeneralReg' and insn_name not in ('PUSH', 'POP'):
-      arg_variants = tuple('*%s' % reg for reg in sample_att_arguments['GeneralReg'])
-    elif arg_class[:3] == 'Imm' and insn_name in (
-        'PSLLW', 'PSRAW', 'PSRLW', 'PSLLD', 'PSRAD', 'PSRLD',
-        'PSLLQ', 'PSRLQ', 'PSLLDQ', 'PSRLDQ',
-        'RCLB', 'RCLW', 'RCLL', 'RCLQ', 'RCRB', 'RCRW', 'RCRL', 'RCRQ',
-        'ROLB', 'ROLW', 'ROLL', 'ROLQ', 'RORB', 'RORW', 'RORL', 'RORQ',
-        'SHLB', 'SHLW', 'SHLL', 'SHLQ', 'SHRB', 'SHRW', 'SHRL', 'SHRQ',
-        'SARB', 'SARW', 'SARL', 'SARQ', 'BTCB', 'BTCW', 'BTCL', 'BTCQ'):
-      arg_variants = sample_att_arguments[insn_arg['class']][1:]
+      arg_variants = indirect_att_arguments['GeneralReg']
+    elif arg_class[:3] == 'Imm' and insn_name in SHIFT_IMM_INSNS:
+      arg_variants = sample_att_arguments[arg_class][1:]
     elif ((arg_class == 'Mem32' and insn_name in ('JMPL', 'CALLL')) or
           (arg_class == 'VecMem64' and insn_name in ('JMPQ', 'CALLQ'))):
-      arg_variants = tuple('*%s' % reg for reg in sample_att_arguments[insn_arg['class']])
-    elif arg_class in FIXED_REGISTER_CLASSES:
-      # Note: arguments from FIXED_REGISTER_CLASSES are implicit in AT&T assembler
-      # (except for accumulator in some instructions).  Skip them.
-      continue
+      arg_variants = indirect_att_arguments[arg_class]
     else:
-      arg_variants = sample_att_arguments[insn_arg['class']]
+      arg_variants = sample_att_arguments[arg_class]
     # Some instructions have special encodings with certain immediates
     # (e.g. shifts by 1, introduced in 8086, are encoded differently than
     # shifts by 2, introduced in 80186).
@@ -376,40 +497,160 @@ def _gen_att_instruction_variants(
       # cases where operands are specified in a wrong order in JSON.
       arg_variants = (arg_variants[arg_nr % len(arg_variants)],)
     insn_sample_args.append(arg_variants)
-  for insn_args in itertools.product(*insn_sample_args):
-    fixed_name = insn_name
-    if insn_name == 'MOVQ' and not '(' in insn_args[0] and '%' in insn_args[0]:
-      # This is rare case where ARC code emitter produces code more optimal than
-      # GNU assembler.  Reproduce that optimization here.
-      if insn_args[1][0] == '$' and insn_args[1] not in ('$-1', '$4294967296'):
-        fixed_name = 'MOVL'
-        # Make 32-bit version of register name.  High registers need to add
-        # 'D' suffix, for low ones we need to replace 'R' with 'E'.
-        if insn_args[0] in ('%R8', '%R9', '%R10', '%R11',
-                            '%R12', '%R13', '%R14', '%R15'):
-          insn_args = (insn_args[0] + 'D',) + insn_args[1:]
-        else:
-          insn_args = ('%E' + insn_args[0][2:],) + insn_args[1:]
-    if insn_name[0:4] == 'LOCK':
-     # TODO(b/161986409): replace '\n' with ' ' when clang would be fixed.
-     fixed_name = '%s\n%s' % (insn_name[0:4], insn_name[4:])
-    fixed_name = {
-      # GNU disassembler accepts these instructions, but not Clang assembler.
-      'FNDISI': '.byte 0xdb, 0xe1',
-      'FNENI': '.byte 0xdb, 0xe0',
-      'FNSETPM': '.byte 0xdb, 0xe4',
-    }.get(fixed_name, fixed_name)
-    if label_present:
-      print('.p2align 5, 0x90', file=file)
-      print('0:', file=file)
-      for _ in range(256):
-        print('nop', file=file)
-      print('1:', file=file)
-    print('%s %s' % (fixed_name, ', '.join(reversed(insn_args))), file=file)
+  if pairwise_mode:
+    insn_args_variants = _pairwise_product(insn_sample_args)
+  elif sample_count:
+    insn_args_variants = _random_sample_product(insn_sample_args, sample_count)
+  else:
+    insn_args_variants = itertools.product(*insn_sample_args)
+  # MOVQ of immediate to register is a rare case where ARC code emitter
+  # produces code more optimal than GNU assembler.  Reproduce that
+  # optimization here: map register names to their 32-bit versions.  High
+  # registers need to add 'D' suffix, for low ones we need to replace 'R'
+  # with 'E'.
+  movl_regs = {}
+  if insn_name == 'MOVQ':
+    movl_regs = {reg: reg + 'D' if reg in _HIGH_GP_REGISTERS_64 else
+                      '%E' + reg[2:]
+                 for reg in insn_sample_args[0]
+                 if '(' not in reg and '%' in reg}
+  base_fixed_name = insn_name
+  if insn_name.startswith('LOCK'):
+    # TODO(b/161986409): replace '\n' with ' ' when clang would be fixed.
+    base_fixed_name = '%s\n%s' % (insn_name[:4], insn_name[4:])
+  base_fixed_name = CLANG_UNSUPPORTED_INSNS.get(
+      base_fixed_name, base_fixed_name)
+  for insn_args in insn_args_variants:
+    fixed_name = base_fixed_name
+    if (movl_regs and insn_args[0] in movl_regs and insn_args[1][0] == '$' and
+        insn_args[1] not in ('$-1', '$4294967296')):
+      fixed_name = 'MOVL'
+      insn_args = (movl_regs[insn_args[0]],) + insn_args[1:]
     if label_present:
-      for _ in range(256):
-        print('nop', file=file)
-      print('2:', file=file)
+      file.writelines((
+          '.p2align 5, 0x90\n0:\n', _NOP_BLOCK_256, '1:\n',
+          '%s %s\n' % (fixed_name, ', '.join(insn_args[::-1])),
+          _NOP_BLOCK_256, '2:\n'))
+    else:
+      file.write('%s %s\n' % (fixed_name, ', '.join(insn_args[::-1])))
+
+
+def _pairwise_product(arg_lists):
+  return [tuple(arg_list[index] for arg_list, index in zip(arg_lists, indexes))
+          for indexes in _pairwise_indexes(tuple(len(l) for l in arg_lists))]
+
+
+# Returns list of index tuples which include each pair of values of any two
+# arguments at least once.  Number of tuples is close to the product of two
+# largest sizes rather than product of all sizes.
+#
+# AT&T and ARC generators have to produce the exact same sequence: ARC
+# generator uses _pairwise_plan directly and must follow the same order.
+@functools.lru_cache(maxsize=None)
+def _pairwise_indexes(sizes):
+  plan = _pairwise_plan(sizes)
+  if plan is None:
+    return list(itertools.product(*(range(size) for size in sizes)))
+  first, second, rest, extra_indexes = plan
+  return [_pairwise_base_indexes(sizes, first, second, rest, i, j)
+          for i in range(sizes[first])
+          for j in range(sizes[second])] + extra_indexes
+
+
+def _pairwise_base_indexes(sizes, first, second, rest, i, j):
+  indexes = [0] * len(sizes)
+  indexes[first] = i
+  indexes[second] = j
+  for arg_nr in rest:
+    indexes[arg_nr] = (i + j) % sizes[arg_nr]
+  return tuple(indexes)
+
+
+# Returns None if there are two or less arguments with more than one choice:
+# all combinations are needed then.
+#
+# Otherwise all combinations of two largest arguments (first and second) are
+# taken, while value of each other argument is (i + j) % size, where i and j
+# are indexes of first and second.  That way each value of other argument
+# meets every value of first and second (as they are not smaller).  Pairs of
+# other arguments which are still not covered are added as extra_indexes.
+@functools.lru_cache(maxsize=None)
+def _pairwise_plan(sizes):
+  varying = [arg_nr for arg_nr, size in enumerate(sizes) if size > 1]
+  if len(varying) <= 2:
+    return None
+  order = sorted(varying, key=lambda arg_nr: -sizes[arg_nr])
+  first, second, rest = order[0], order[1], order[2:]
+  rest_pairs = list(itertools.combinations(rest, 2))
+  uncovered = set(
+      (arg_nr1, arg_nr2, value1, value2)
+      for arg_nr1, arg_nr2 in rest_pairs
+      for value1 in range(sizes[arg_nr1])
+      for value2 in range(sizes[arg_nr2]))
+  for i in range(sizes[first]):
+    for j in range(sizes[second]):
+      indexes = _pairwise_base_indexes(sizes, first, second, rest, i, j)
+      uncovered.difference_update(
+          (arg_nr1, arg_nr2, indexes[arg_nr1], indexes[arg_nr2])
+          for arg_nr1, arg_nr2 in rest_pairs)
+  extra_indexes = []
+  while uncovered:
+    indexes = [None] * len(sizes)
+    for arg_nr1, arg_nr2, value1, value2 in sorted(uncovered):
+      if (indexes[arg_nr1] in (None, value1) and
+          indexes[arg_nr2] in (None, value2)):
+        indexes[arg_nr1] = value1
+        indexes[arg_nr2] = value2
+    indexes = tuple(0 if index is None else index for index in indexes)
+    uncovered.difference_update(
+        (arg_nr1, arg_nr2, indexes[arg_nr1], indexes[arg_nr2])
+        for arg_nr1, arg_nr2 in rest_pairs)
+    extra_indexes.append(indexes)
+  return first, second, rest, extra_indexes
+
+
+@functools.lru_cache(maxsize=None)
+def _get_arc_name_suffix(arc_name):
+  for arc_suffix in ARC_NAME_SUFFIXES:
+    if arc_name.endswith(arc_suffix):
+      return arc_suffix
+  return None
+
+
+def _random_sample_product(arg_lists, sample_count):
+  sizes = tuple(len(l) for l in arg_lists)
+  samples = _random_sample_indexes(sizes, sample_count)
+  if samples is None:
+    return itertools.product(*arg_lists)
+  strides = _get_sample_strides(sizes)
+  return [tuple(arg_list[sample // stride % len(arg_list)]
+                for arg_list, stride in zip(arg_lists, strides))
+          for sample in samples]
+
+
+# Returns sorted list of indexes in the product of all arguments (first
+# argument changes fastest) or None if product is not larger than
+# sample_count and all combinations should be used.  Indexes are picked
+# randomly, but each value of each argument is used at least once.
+#
+# Arguments with only one value don't affect the result, thus AT&T and ARC
+# generators get the same samples even if ARC generator omits such arguments.
+@functools.lru_cache(maxsize=None)
+def _random_sample_indexes(sizes, sample_count):
+  total = math.prod(sizes)
+  if total <= sample_count:
+    return None
+  strides = _get_sample_strides(sizes)
+  samples = set(sum(i % size * stride for size, stride in zip(sizes, strides))
+                for i in range(max(sizes)))
+  rng = random.Random(_SAMPLE_SEED)
+  while len(samples) < sample_count:
+    samples.add(rng.randrange(total))
+  return sorted(samples)
+
+
+def _get_sample_strides(sizes):
+  return tuple(math.prod(sizes[:arg_nr]) for arg_nr in range(len(sizes)))
 
 
 def _gen_att_call_variants(file, call_args, fast_mode):
@@ -420,55 +661,89 @@ def _gen_att_call_variants(file, call_args, fast_mode):
   if fast_mode:
     arg_variants = (arg_variants[1],)
   for call_arg in arg_variants:
-    print('CALL *%s' % call_arg, file=file)
+    file.write('CALL *%s\n' % call_arg)
 
 
 def _gen_arc_generators(file):
+  # Many classes share the same samples (e.g. all memory operands).  Only
+  # first of them gets an array, others return it.
+  out = []
+  generators = {}
   for arg_class, arc_args in sample_arc_arguments.items():
     if arg_class == 'Label':
       continue
     arg_type = _argument_class_to_arc_type(arg_class)
-    print('%s* %sArgs() {' % (arg_type, arg_class), file=file)
-    print('  static %s* arg_list;' % arg_type, file=file)
-    print('  if (!arg_list) {', file=file)
-    print('    arg_list = reinterpret_cast<%s*>(malloc(%d * sizeof(%s)));' %
-          (arg_type, len(arc_args), arg_type), file=file)
-    for arg_nr, arg in enumerate(arc_args):
-      print('    arg_list[%d] = %s;' % (arg_nr, arg), file=file)
-    print('  }', file=file)
-    print('  return arg_list;', file=file)
-    print('}', file=file)
-    print('', file=file)
-
-
-def _gen_arc_assembler(file, insn_kind, insns, fast_mode):
-  for insn in insns:
-    _gen_arc_instruction_variants(file, insn['asm'], insn['args'], fast_mode)
-  print('void GenInsns%s(Assembler* as) {' %
-        insn_kind, file=file)
+    out.append('%s* %sArgs() {' % (arg_type, arg_class))
+    shared_class = generators.setdefault((arg_type, arc_args), arg_class)
+    if shared_class != arg_class:
+      out.append('  return %sArgs();' % shared_class)
+      out.append('}')
+      out.append('')
+      continue
+    out.append('  static %s arg_list[] = {' % arg_type)
+    for arg in arc_args:
+      out.append('    %s,' % arg)
+    out.append('  };')
+    out.append('  return arg_list;')
+    out.append('}')
+    out.append('')
+  _write_lines(file, out)
+
+
+def _gen_arc_insns_function(file, insn_kind, insns):
+  out = ['void GenInsns%s(Assembler* as) {' % insn_kind]
   for insn in insns:
     classes = [insn_arg['class'] for insn_arg in insn['args']]
-    print('  %s_%s(as);' % (insn['asm'], '_'.join(classes)), file=file)
+    out.append('  %s_%s(as);' % (insn['asm'], '_'.join(classes)))
   if not insns:
-    print('  UNUSED(as);', file=file)
-  print('}', file=file)
-  print('', file=file)
-
-
-def _gen_arc_instruction_variants(file, arc_name, insn_args, fast_mode):
-  classes = [insn_arg['class'] for insn_arg in insn_args]
-  print('void %s_%s(Assembler* as) {' %
-        (arc_name, '_'.join(classes)), file=file)
+    out.append('  UNUSED(as);')
+  out.append('}')
+  out.append('')
+  _write_lines(file, out)
+
+
+def _gen_arc_insn(insn, fast_mode, pairwise_mode, sample_count=None):
+  arc_name = insn['asm']
+  # Many instructions have the same operands, their tests only differ in
+  # instruction name.
+  return _get_arc_insn_template(
+      tuple(insn_arg['class'] for insn_arg in insn['args']),
+      arc_name in SHIFT_IMM_ARC_INSNS,
+      fast_mode,
+      pairwise_mode,
+      sample_count).replace(_ARC_NAME_PLACEHOLDER, arc_name)
+
+
+@functools.lru_cache(maxsize=None)
+def _get_arc_insn_template(
+    classes, shift_insn, fast_mode, pairwise_mode, sample_count):
+  out = []
+  _gen_arc_instruction_variants(
+      out, _ARC_NAME_PLACEHOLDER, classes, shift_insn, fast_mode,
+      pairwise_mode, sample_count)
+  return ''.join(line + '\n' for line in out)
+
+
+def _gen_arc_instruction_variants(out, arc_name, classes, shift_insn,
+                                  fast_mode, pairwise_mode, sample_count=None):
+  out.append('void %s_%s(Assembler* as) {' % (arc_name, '_'.join(classes)))
   label_present = False
   arg_type_count = 0
   indent = ''
-  for arg_nr, insn_arg in enumerate(insn_args):
-    arg_class = insn_arg['class']
+  call_args = ', '.join(
+      '%sarg%d' % ('*' if arg_class != 'Label' else '**', nr)
+      for nr, arg_class in enumerate(classes)
+      if arg_class not in FIXED_REGISTER_CLASSES)
+  # In pairwise and sample modes only a subset of combinations of arguments
+  # (except condition) is generated, see _pairwise_plan and
+  # _random_sample_indexes.
+  sampled_args = []
+  for arg_nr, arg_class in enumerate(classes):
     arg_ref = '*'
-    indent = ' ' * (2 * arg_type_count)
+    indent = _INDENTS[arg_type_count]
     if arg_class == 'Label':
       label_present = True
-      print('%s  Assembler::Label* labels[3];' % indent, file=file)
+      out.append('%s  Assembler::Label* labels[3];' % indent)
       args_generator = 'labels'
       arg_ref = '**'
     else:
@@ -480,58 +755,136 @@ def _gen_arc_instruction_variants(file, arc_name, insn_args, fast_mode):
       else:
         arg_choices = len(sample_arc_arguments[arg_class])
       arg_shift = ''
-      if arg_class[:3] == 'Imm' and arc_name in (
-          'Psllw', 'Psraw', 'Psrlw', 'Pslld', 'Psrad', 'Psrld',
-          'Psllq', 'Psrlq', 'Pslldq', 'Psrldq',
-          'Rclb', 'Rclw', 'Rcll', 'Rclq', 'Rcrb', 'Rcrw', 'Rcrl', 'Rcrq',
-          'Rolb', 'Rolw', 'Roll', 'Rolq', 'Rorb', 'Rorw', 'Rorl', 'Rorq',
-          'Shlb', 'Shlw', 'Shll', 'Shlq', 'Shrb', 'Shrw', 'Shrl', 'Shrq',
-          'Sarb', 'Sarw', 'Sarl', 'Sarq', 'Btcb', 'Btcw', 'Btcl', 'Btcq'):
+      if arg_class[:3] == 'Imm' and shift_insn:
         arg_choices = arg_choices - 1
         arg_shift = ' + 1'
       # See notes about fast_mode handing in _gen_att_instruction_variants.
       if fast_mode and not arg_class.startswith('Imm') and not arg_class == 'Cond':
-        print('%s  %s %sarg%d = %s%s + %d;' %
-              (indent, arg_type, arg_ref, arg_nr, args_generator, arg_shift,
-               arg_nr % arg_choices),
-              file=file)
+        out.append('%s  %s %sarg%d = %s%s + %d;' %
+                   (indent, arg_type, arg_ref, arg_nr, args_generator,
+                    arg_shift, arg_nr % arg_choices))
+      elif (pairwise_mode or sample_count) and arg_class != 'Cond':
+        sampled_args.append(
+            (arg_type, arg_ref, arg_nr, args_generator, arg_shift, arg_choices))
       else:
         arg_type_count += 1
-        print('%s  for (%s %sarg%d = %s%s, %sarg%d_list = arg%d;'
-              ' arg%d != arg%d_list + %d; ++arg%d) {' %
-              (indent, arg_type, arg_ref, arg_nr, args_generator, arg_shift,
-               arg_ref, arg_nr, arg_nr, arg_nr, arg_nr, arg_choices, arg_nr),
-              file=file)
-  indent = ' ' * (2 * arg_type_count)
+        _gen_arc_arg_loop(out, indent, arg_type, arg_ref, arg_nr,
+                          args_generator, arg_shift, arg_choices)
+  indent = _INDENTS[arg_type_count]
+  sizes = tuple(arg_choices for *_, arg_choices in sampled_args)
+  samples = None
+  plan = None
+  if sample_count:
+    samples = _random_sample_indexes(sizes, sample_count)
+  else:
+    plan = _pairwise_plan(sizes)
+  if samples is not None:
+    # Same order as in _random_sample_product.
+    strides = _get_sample_strides(sizes)
+    out.append('%s  static constexpr int64_t kSamples[] = {' % indent)
+    for line_start in range(0, len(samples), 8):
+      out.append('%s      %s,' % (
+          indent,
+          ', '.join(str(sample)
+                    for sample in samples[line_start:line_start + 8])))
+    out.append('%s  };' % indent)
+    out.append('%s  for (int64_t sample : kSamples) {' % indent)
+    _gen_arc_sampled_args(
+        out, indent + '  ', sampled_args,
+        [('sample %% %d' % size) if stride == 1 else
+         ('sample / %d %% %d' % (stride, size))
+         for size, stride in zip(sizes, strides)])
+    _gen_arc_instruction_call(
+        out, indent + '  ', arc_name, call_args, label_present)
+    out.append('%s  }' % indent)
+  elif plan is None:
+    # With two or less arguments all combinations are needed anyway.
+    for arg_type, arg_ref, arg_nr, args_generator, arg_shift, arg_choices in (
+        sampled_args):
+      _gen_arc_arg_loop(out, indent, arg_type, arg_ref, arg_nr,
+                        args_generator, arg_shift, arg_choices)
+      arg_type_count += 1
+      indent = _INDENTS[arg_type_count]
+    _gen_arc_instruction_call(out, indent, arc_name, call_args, label_present)
+  else:
+    # Same order as in _pairwise_indexes: first all combinations of two
+    # largest arguments, then extra samples.
+    first, second, rest, extra_indexes = plan
+    out.append('%s  for (int i = 0; i < %d; ++i) {' % (indent, sizes[first]))
+    out.append(
+        '%s    for (int j = 0; j < %d; ++j) {' % (indent, sizes[second]))
+    base_indexes = []
+    for sample_nr, size in enumerate(sizes):
+      if sample_nr == first:
+        base_indexes.append('i')
+      elif sample_nr == second:
+        base_indexes.append('j')
+      elif sample_nr in rest:
+        base_indexes.append('(i + j) %% %d' % size)
+      else:
+        base_indexes.append('0')
+    _gen_arc_sampled_args(out, indent + '    ', sampled_args, base_indexes)
+    _gen_arc_instruction_call(
+        out, indent + '    ', arc_name, call_args, label_present)
+    out.append('%s    }' % indent)
+    out.append('%s  }' % indent)
+    if extra_indexes:
+      out.append('%s  static constexpr int kExtraSamples[][%d] = {' %
+                 (indent, len(sizes)))
+      for indexes in extra_indexes:
+        out.append(
+            '%s      {%s},' % (indent, ', '.join(str(i) for i in indexes)))
+      out.append('%s  };' % indent)
+      out.append('%s  for (const auto& sample : kExtraSamples) {' % indent)
+      _gen_arc_sampled_args(
+          out, indent + '  ', sampled_args,
+          ['sample[%d]' % sample_nr for sample_nr in range(len(sizes))])
+      _gen_arc_instruction_call(
+          out, indent + '  ', arc_name, call_args, label_present)
+      out.append('%s  }' % indent)
+  for arg_nr in range(arg_type_count, 0, -1):
+    out.append('%s}' % _INDENTS[arg_nr])
+  out.append('}')
+  out.append('')
+
+
+def _gen_arc_sampled_args(out, indent, sampled_args, indexes):
+  for (arg_type, arg_ref, arg_nr, args_generator, arg_shift, _), index in zip(
+      sampled_args, indexes):
+    out.append('%s  %s %sarg%d = %s%s + %s;' %
+               (indent, arg_type, arg_ref, arg_nr, args_generator, arg_shift,
+                index))
+
+
+def _gen_arc_instruction_call(out, indent, arc_name, call_args, label_present):
   if label_present:
-    print('%s  labels[0] = as->MakeLabel();' % indent, file=file)
-    print('%s  labels[1] = as->MakeLabel();' % indent, file=file)
-    print('%s  labels[2] = as->MakeLabel();' % indent, file=file)
-    print('%s  // Don\'t use as->Align(32) for compatibility with GNU as'
-          % indent, file=file)
-    print('%s  while (as->pc()%%32) as->Nop();' % indent, file=file)
-    print('%s  as->Bind(labels[0]);' % indent, file=file)
-    print('%s  for (int nr=0; nr < 256; ++nr)' % indent, file=file)
-    print('%s    as->Nop();' % indent, file=file)
-    print('%s  as->Bind(labels[1]);' % indent, file=file)
-  print('%s  as->%s(%s);' %
-        (indent,
-         arc_name,
-         ', '.join((
-             '%sarg%d' % ('*' if arg['class'] != 'Label' else '**', nr)
-             for nr, arg in enumerate(insn_args)
-             if arg['class'] not in FIXED_REGISTER_CLASSES))),
-        file=file)
+    out.append('%s  labels[0] = as->MakeLabel();' % indent)
+    out.append('%s  labels[1] = as->MakeLabel();' % indent)
+    out.append('%s  labels[2] = as->MakeLabel();' % indent)
+    out.append('%s  // Don\'t use as->Align(32) for compatibility with GNU as'
+               % indent)
+    out.append('%s  while (as->pc()%%32) as->Nop();' % indent)
+    out.append('%s  as->Bind(labels[0]);' % indent)
+    out.append('%s  for (int nr=0; nr < 256; ++nr)' % indent)
+    out.append('%s    as->Nop();' % indent)
+    out.append('%s  as->Bind(labels[1]);' % indent)
+  out.append('%s  as->%s(%s);' % (indent, arc_name, call_args))
   if label_present:
-    print('%s  for (int nr=0; nr < 256; ++nr)' % indent, file=file)
-    print('%s    as->Nop();' % indent, file=file)
-    print('%s  as->Bind(labels[2]);' % indent, file=file)
-  for arg_nr in range(arg_type_count, 0, -1):
-    print('%s}' % (' ' * (2 * arg_nr)), file=file)
-  print('}', file=file)
-  print('', file=file)
+    out.append('%s  for (int nr=0; nr < 256; ++nr)' % indent)
+    out.append('%s    as->Nop();' % indent)
+    out.append('%s  as->Bind(labels[2]);' % indent)
+
+
+def _gen_arc_arg_loop(out, indent, arg_type, arg_ref, arg_nr,
+                      args_generator, arg_shift, arg_choices):
+  out.append('%s  for (%s %sarg%d = %s%s, %sarg%d_list = arg%d;'
+             ' arg%d != arg%d_list + %d; ++arg%d) {' %
+             (indent, arg_type, arg_ref, arg_nr, args_generator, arg_shift,
+              arg_ref, arg_nr, arg_nr, arg_nr, arg_nr, arg_choices, arg_nr))
 
 
+# Note: depends on sample_arc_arguments, _update_arguments resets the cache.
+@functools.lru_cache(maxsize=None)
 def _argument_class_to_arc_type(arg_class):
   if arg_class == 'Imm2':
     return 'int8_t'
@@ -541,7 +894,7 @@ def _argument_class_to_arc_type(arg_class):
     return 'Assembler::Condition'
   elif arg_class == 'Label':
     return 'Assembler::Label'
-  elif sample_arc_arguments[arg_class][0] in gp_registers_32 + gp_registers_64:
+  elif sample_arc_arguments[arg_class][0] in _GP_REGISTERS:
     return 'Assembler::Register'
   elif sample_arc_arguments[arg_class][0].startswith('Assembler::st'):
     return 'Assembler::X87Register'
@@ -18,6 +18,8 @@
 """Generate assembler files out of the definition file."""
 
 import asm_defs
+import concurrent.futures
+import functools
 import os
 import re
 import sys
@@ -25,6 +27,16 @@ import sys
 
 INDENT = '  '
 
+_IDENTIFIER_RE = re.compile('[_a-zA-Z]')
+
+# Maps opcode byte, as written in the definition file, to its C++ literal.
+# Other valid hex spellings (e.g. with 0x prefix) are converted on the fly.
+_OPCODE_LITERALS = {
+    fmt % byte: '0x%02x' % byte
+    for byte in range(256)
+    for fmt in ('%x', '%X', '%02x', '%02X')
+}
+
 _imm_types = {
     'Imm2': 'int8_t',
     'Imm8': 'int8_t',
@@ -35,7 +47,12 @@ _imm_types = {
 
 
 def _get_arg_type_name(arg):
-  cls = arg.get('class')
+  return _get_class_type_name(arg['class'])
+
+
+# There are only few dozens of argument classes, cache the result.
+@functools.lru_cache(maxsize=None)
+def _get_class_type_name(cls):
   if asm_defs.is_x87reg(cls):
     return 'X87Register'
   if asm_defs.is_greg(cls):
@@ -57,45 +74,47 @@ def _get_arg_type_name(arg):
 
 def _get_immediate_type(insn):
   imm_type = None
-  for arg in insn.get('args'):
-    cls = arg.get('class')
+  for arg in insn['args']:
+    cls = arg['class']
     if asm_defs.is_imm(cls):
       assert imm_type is None
       imm_type = _imm_types[cls]
   return imm_type
 
 
+def _get_explicit_args(insn):
+  return [arg for arg in insn['args'] if not asm_defs.is_implicit_reg(arg['class'])]
+
+
 def _get_params(insn):
-  result = []
-  arg_count = 0
-  for arg in insn.get('args'):
-    if asm_defs.is_implicit_reg(arg.get('class')):
-      continue
-    result.append("%s arg%d" % (_get_arg_type_name(arg), arg_count))
-    arg_count += 1
-  return ', '.join(result)
+  return ', '.join(
+      "%s arg%d" % (arg['_type_name'], arg_count)
+      for arg_count, arg in enumerate(insn['_explicit_args']))
 
 
 def _contains_mem(insn):
-  return any(asm_defs.is_mem_op(arg['class']) for arg in insn.get('args'))
+  return any(arg['_type_name'] == 'const Operand&'
+             for arg in insn['_explicit_args'])
 
 
 def _get_template_name(insn):
-  name = insn.get('asm')
-  if '<' not in name:
+  name, _, template_args = insn['asm'].partition('<')
+  if not template_args:
     return None, name
   return 'template <%s>' % ', '.join(
       'bool' if param.strip() in ('true', 'false') else
-      'typename' if re.search('[_a-zA-Z]', param) else 'int'
-      for param in name.split('<',1)[1][:-1].split(',')), name.split('<')[0]
+      'typename' if _IDENTIFIER_RE.search(param) else 'int'
+      for param in template_args[:-1].split(',')), name
 
 
-def _gen_generic_functions_h(f, insns, binary_assembler):
+def _gen_generic_functions_h(out, insns, binary_assembler):
   template_names = set()
+  # Only binary assembler looks for shortcuts, text assembler needs no index.
+  insn_index = _build_insn_index(insns) if binary_assembler else None
   for insn in insns:
-    template, name = _get_template_name(insn)
-    params = _get_params(insn)
-    imm_type = _get_immediate_type(insn)
+    template, name = insn['_template'], insn['_name']
+    params = insn['_params']
+    imm_type = insn['_imm_type']
     if template:
       # We could only describe each template function once, or that would be
       # compilation error.  Yet functions with the same name but different
@@ -107,14 +126,11 @@ def _gen_generic_functions_h(f, insns, binary_assembler):
       #
       # Use function name + parameters (as described by _get_params) to get
       # full description of template function.
-      template_name = str({
-          'name': name,
-          'params': _get_params(insn)
-      })
-      if template_name in template_names:
+      template_key = (name, params)
+      if template_key in template_names:
         continue
-      template_names.add(template_name)
-      print(template, file=f)
+      template_names.add(template_key)
+      out.append(template)
     # If this is binary assembler then we only generate header and then actual
     # implementation is written manually.
     #
@@ -122,89 +138,96 @@ def _gen_generic_functions_h(f, insns, binary_assembler):
     # just a simple generic implementation.
     if binary_assembler:
       if 'opcodes' in insn:
-        print('void %s(%s) {' % (name, params), file=f)
-        _gen_emit_shortcut(f, insn, insns)
-        _gen_emit_instruction(f, insn)
-        print('}', file=f)
+        # Shortcuts are the same for both forms below, only look them up once.
+        shortcut = []
+        _gen_emit_shortcut(shortcut, insn, insn_index)
+        out.append('void %s(%s) {' % (name, params))
+        out.extend(shortcut)
+        _gen_emit_instruction(out, insn)
+        out.append('}')
         # If we have a memory operand (there may be at most one) then we also
         # have a special x86-64 exclusive form which accepts Label (it can be
         # emulated on x86-32, too, if needed).
-        if 'const Operand&' in params:
-          print("", file=f)
-          print('void %s(%s) {' % (
-              name, params.replace('const Operand&', 'const LabelOperand')), file=f)
-          _gen_emit_shortcut(f, insn, insns)
-          _gen_emit_instruction(f, insn, rip_operand=True)
-          print('}\n', file=f)
+        if insn['_contains_mem']:
+          out.append("")
+          out.append('void %s(%s) {' % (
+              name, params.replace('const Operand&', 'const LabelOperand')))
+          out.extend(shortcut)
+          _gen_emit_instruction(out, insn, rip_operand=True)
+          out.append('}\n')
       else:
-        print('void %s(%s);' % (name, params), file=f)
+        out.append('void %s(%s);' % (name, params))
       if imm_type is not None:
         if template:
-          print(template[:-1] + ", typename ImmType>", file=f)
+          out.append(template[:-1] + ", typename ImmType>")
         else:
-          print('template<typename ImmType>', file=f)
-        print(('auto %s(%s) -> '
+          out.append('template<typename ImmType>')
+        out.append(('auto %s(%s) -> '
                     'std::enable_if_t<std::is_integral_v<ImmType> && '
                     'sizeof(%s) < sizeof(ImmType)> = delete;') % (
-                        name, params.replace(imm_type, 'ImmType'), imm_type), file=f)
+                        name, params.replace(imm_type, 'ImmType'), imm_type))
     else:
-      print('void %s(%s) {' % (name, params), file=f);
+      out.append('void %s(%s) {' % (name, params))
       if 'feature' in insn:
-        print('  SetRequiredFeature%s();' % insn['feature'], file=f)
-      print('  Instruction(%s);' % ', '.join(
-          ['"%s"' % name] + list(_gen_instruction_args(insn))), file=f)
-      print('}', file=f)
+        out.append('  SetRequiredFeature%s();' % insn['feature'])
+      out.append('  Instruction("%s"%s);' % (name, insn['_instruction_args']))
+      out.append('}')
 
 
-def _gen_instruction_args(insn):
-  arg_count = 0
-  for arg in insn.get('args'):
-    if asm_defs.is_implicit_reg(arg.get('class')):
-      continue
-    if _get_arg_type_name(arg) == 'Register':
-      yield 'typename Assembler::%s(arg%d)' % (
+def _get_instruction_args(insn):
+  # Returns arguments of the text assembler Instruction() call, each preceded
+  # by a comma since instruction name is always passed first.
+  return ''.join(
+      ', typename Assembler::%s(arg%d)' % (
           _ARGUMENT_FORMATS_TO_SIZES[arg['class']], arg_count)
-    else:
-      yield 'arg%d' % arg_count
-    arg_count += 1
+      if arg['_type_name'] == 'Register' else ', arg%d' % arg_count
+      for arg_count, arg in enumerate(insn['_explicit_args']))
 
 
-def _gen_emit_shortcut(f, insn, insns):
+def _get_shortcut_flags(insn):
+  # Returns which kinds of shortcuts may apply to instruction, see
+  # _gen_emit_shortcut.
+  args = insn['args']
+  classes = [arg['class'] for arg in args]
+  return (classes.count('Imm8') == 1,
+          classes.count('Imm16') + classes.count('Imm32') == 1,
+          insn['asm'].endswith('Accumulator'),
+          len(args) > 1 and classes[0].startswith('GeneralReg'))
+
+
+def _gen_emit_shortcut(out, insn, insn_index):
+  (has_single_imm8, has_single_imm16_or_imm32,
+   is_accumulator, first_is_greg) = insn['_shortcut_flags']
   # If we have one 'Imm8' argument then it could be shift, try too see if
   # ShiftByOne with the same arguments exist.
-  if asm_defs.exactly_one_of(arg['class'] == 'Imm8' for arg in insn['args']):
-    _gen_emit_shortcut_shift(f, insn, insns)
-  if asm_defs.exactly_one_of(arg['class'] in ('Imm16', 'Imm32') for arg in insn['args']):
-    if insn['asm'].endswith('Accumulator'):
-      _gen_emit_shortcut_accumulator_imm8(f, insn, insns)
+  if has_single_imm8:
+    _gen_emit_shortcut_shift(out, insn, insn_index)
+  if has_single_imm16_or_imm32:
+    if is_accumulator:
+      _gen_emit_shortcut_accumulator_imm8(out, insn, insn_index)
     else:
-      _gen_emit_shortcut_generic_imm8(f, insn, insns)
-  if len(insn['args']) > 1 and insn['args'][0]['class'].startswith('GeneralReg'):
-    _gen_emit_shortcut_accumulator(f, insn, insns)
+      _gen_emit_shortcut_generic_imm8(out, insn, insn_index)
+  if first_is_greg:
+    _gen_emit_shortcut_accumulator(out, insn, insn_index)
 
 
-def _gen_emit_shortcut_shift(f, insn, insns):
+def _gen_emit_shortcut_shift(out, insn, insn_index):
   # Replace Imm8 argument with '1' argument.
-  non_imm_args = [arg for arg in insn['args'] if arg['class'] != 'Imm8']
-  imm_arg_index = insn['args'].index({'class': 'Imm8'})
-  for maybe_shift_by_1_insn in insns:
-    if not _is_insn_match(maybe_shift_by_1_insn,
-                          insn['asm'] + 'ByOne',
-                          non_imm_args):
-      continue
-    # Now call that version if immediate is 1.
-    args = []
-    arg_count = 0
-    for arg in non_imm_args:
-      if asm_defs.is_implicit_reg(arg['class']):
-        continue
-      args.append('arg%d' % arg_count)
-      arg_count += 1
-    print('  if (arg%d == 1) return %sByOne(%s);' % (
-        imm_arg_index, insn['asm'], ', '.join(args)), file=f)
+  non_imm_args = []
+  for arg_index, arg_key in enumerate(insn['_args_key']):
+    if arg_key[0] == 'Imm8':
+      imm_arg_index = arg_index
+    else:
+      non_imm_args.append(arg_key)
+  if _find_insn(insn_index, insn['asm'] + 'ByOne', tuple(non_imm_args)):
+    # Now call that version if immediate is 1.  It has all the same explicit
+    # arguments except immediate.
+    out.append('  if (arg%d == 1) return %sByOne(%s);' % (
+        imm_arg_index, insn['asm'],
+        ', '.join('arg%d' % n for n in range(insn['_arg_count'] - 1))))
 
 
-def _gen_emit_shortcut_accumulator_imm8(f, insn, insns):
+def _gen_emit_shortcut_accumulator_imm8(out, insn, insn_index):
   insn_name = insn['asm'][:-11]
   args = insn['args']
   assert len(args) == 3 and args[2]['class'] == 'FLAGS'
@@ -218,65 +241,66 @@ def _gen_emit_shortcut_accumulator_imm8(f, insn, insns):
       'EAX': 'GeneralReg32',
       'RAX': 'GeneralReg64'
   }[acc_class]
-  maybe_8bit_imm_args = [
-    { 'class': greg_class, 'usage': args[0]['usage'] },
-    { 'class': 'Imm8' },
-    { 'class': 'FLAGS', 'usage': insn['args'][2]['usage'] }
-  ]
-  for maybe_imm8_insn in insns:
-    if not _is_insn_match(maybe_imm8_insn,
-                          insn_name + 'Imm8',
-                          maybe_8bit_imm_args):
-      continue
-    print('  if (IsInRange<int8_t>(arg0)) {', file=f)
-    print(('    return %s(Assembler::Accumulator(), '
-                 'static_cast<int8_t>(arg0));') % (
-                     maybe_imm8_insn['asm'],), file=f)
-    print('  }', file=f)
-
-def _gen_emit_shortcut_generic_imm8(f, insn, insns):
-  maybe_8bit_imm_args = [{ 'class': 'Imm8' } if arg['class'].startswith('Imm') else arg
-                         for arg in insn['args']]
-  imm_arg_index = maybe_8bit_imm_args.index({'class': 'Imm8'})
-  for maybe_imm8_insn in insns:
-    if not _is_insn_match(maybe_imm8_insn,
-                          insn['asm'] + 'Imm8',
-                          maybe_8bit_imm_args):
-      continue
+  maybe_8bit_imm_args = (
+    (greg_class, args[0]['usage']),
+    ('Imm8', None),
+    ('FLAGS', args[2]['usage'])
+  )
+  maybe_imm8_insn = _find_insn(insn_index, insn_name + 'Imm8', maybe_8bit_imm_args)
+  if maybe_imm8_insn:
+    out.append('  if (IsInRange<int8_t>(arg0)) {')
+    out.append(('    return %s(Assembler::Accumulator(), '
+                'static_cast<int8_t>(arg0));') % (
+                    maybe_imm8_insn['asm'],))
+    out.append('  }')
+
+def _gen_emit_shortcut_generic_imm8(out, insn, insn_index):
+  maybe_8bit_imm_args = tuple(
+      ('Imm8', None) if arg_key[0].startswith('Imm') else arg_key
+      for arg_key in insn['_args_key'])
+  maybe_imm8_insn = _find_insn(insn_index, insn['asm'] + 'Imm8', maybe_8bit_imm_args)
+  if maybe_imm8_insn:
     # Now call that version if immediate fits into 8-bit.
-    arg_count = len(_get_params(insn).split(','))
-    print('  if (IsInRange<int8_t>(arg%d)) {' % (arg_count - 1), file=f)
-    print('   return %s(%s);' % (maybe_imm8_insn['asm'], ', '.join(
+    arg_count = insn['_arg_count']
+    out.append('  if (IsInRange<int8_t>(arg%d)) {' % (arg_count - 1))
+    out.append('   return %s(%s);' % (maybe_imm8_insn['asm'], ', '.join(
         ('static_cast<int8_t>(arg%d)' if n == arg_count - 1 else 'arg%d') % n
-        for n in range(arg_count))), file=f)
-    print('  }', file=f)
+        for n in range(arg_count))))
+    out.append('  }')
 
 
-def _gen_emit_shortcut_accumulator(f, insn, insns):
+def _gen_emit_shortcut_accumulator(out, insn, insn_index):
+  args = insn['args']
   accumulator_name = {
       'GeneralReg8': 'AL',
       'GeneralReg16': 'AX',
       'GeneralReg32': 'EAX',
       'GeneralReg64': 'RAX'
-  }[insn['args'][0]['class']]
-  maybe_accumulator_args = [
-      { 'class': accumulator_name, 'usage': insn['args'][0]['usage']}
-  ] + insn['args'][1:]
-  for maybe_accumulator_insn in insns:
-    if not _is_insn_match(maybe_accumulator_insn,
-                          insn['asm'] + 'Accumulator',
-                          maybe_accumulator_args):
-      continue
+  }[args[0]['class']]
+  maybe_accumulator_args = (
+      (accumulator_name, args[0]['usage']),
+  ) + insn['_args_key'][1:]
+  maybe_accumulator_insn = _find_insn(
+      insn_index, insn['asm'] + 'Accumulator', maybe_accumulator_args)
+  if maybe_accumulator_insn:
     # Now call that version if register is an Accumulator.
-    arg_count = len(_get_params(insn).split(','))
-    print('  if (Assembler::IsAccumulator(arg0)) {', file=f)
-    print('  return %s(%s);' % (
+    arg_count = insn['_arg_count']
+    out.append('  if (Assembler::IsAccumulator(arg0)) {')
+    out.append('  return %s(%s);' % (
       maybe_accumulator_insn['asm'],
-      ', '.join('arg%d' % n for n in range(1, arg_count))), file=f)
-    print('}', file=f)
+      ', '.join('arg%d' % n for n in range(1, arg_count))))
+    out.append('}')
+
+
+def _get_args_key(args):
+  return tuple((arg['class'], arg.get('usage')) for arg in args)
+
 
+def _build_insn_index(insns):
+  return {(insn['asm'], insn['_args_key']): insn for insn in insns}
 
-def _is_insn_match(insn, expected_name, expected_args):
+
+def _find_insn(insn_index, expected_name, expected_args_key):
   # Note: usually there are more than one instruction with the same name
   # but different arguments because they could accept either GeneralReg
   # or Memory or Immediate argument.
@@ -294,8 +318,11 @@ def _is_insn_match(insn, expected_name, expected_args):
   #
   # We want to ensure that we have the exact match - expected name plus
   # expected arguments.
-
-  return insn['asm'] == expected_name and insn['args'] == expected_args
+  #
+  # Instructions are indexed by that pair (see _build_insn_index) to avoid
+  # scanning the whole list of instructions for every instruction.  Arguments
+  # are compared by their (class, usage) keys, see _get_args_key.
+  return insn_index.get((expected_name, expected_args_key))
 
 
 _ARGUMENT_FORMATS_TO_SIZES = {
@@ -340,14 +367,28 @@ _ARGUMENT_FORMATS_TO_SIZES = {
 # e.g. VectorMemory32Bit becomes VectorLabel32Bit.
 #
 # Note: on x86-32 that mode can also be emulated using regular instruction form, if needed.
-def _gen_emit_instruction(f, insn, rip_operand=False):
-  result = []
-  arg_count = 0
-  for arg in insn['args']:
-    if asm_defs.is_implicit_reg(arg['class']):
-      continue
-    result.append('%s(arg%d)' % (_ARGUMENT_FORMATS_TO_SIZES[arg['class']], arg_count))
-    arg_count += 1
+def _gen_emit_instruction(out, insn, rip_operand=False):
+  args = insn['_emit_args']
+  # If we want %rip--operand then we need to replace 'Memory' with 'Labal'
+  if rip_operand:
+    args = args.replace('Memory', 'Label')
+  # This line is emitted for every instruction: use plain concatenation.
+  out.append('  EmitInstruction<Opcodes<' + insn['_opcodes'] + '>>(' + args + ');')
+
+
+def _get_emit_args(insn):
+  result = ['%s(arg%d)' % (_ARGUMENT_FORMATS_TO_SIZES[arg['class']], arg_count)
+            for arg_count, arg in enumerate(insn['_explicit_args'])]
+  permutation = _get_arg_permutation(insn)
+  if permutation:
+    result = [result[arg_count] for arg_count in permutation]
+  return ', '.join(result)
+
+
+def _get_arg_permutation(insn):
+  # Returns order in which explicit arguments are passed to EmitInstruction
+  # or None if they are passed as is.
+  result = list(range(len(insn['_explicit_args'])))
   if insn.get('reg_to_rm', False):
     result[0], result[1] = result[1], result[0]
   if insn.get('rm_to_vex', False):
@@ -358,55 +399,71 @@ def _gen_emit_instruction(f, insn, rip_operand=False):
     result[0], result[1], result[2], result[3] = result[0], result[2], result[1], result[3]
   if insn.get('vex_rm_to_reg', False):
     result[0], result[1], result[2] = result[0], result[2], result[1]
-  # If we want %rip--operand then we need to replace 'Memory' with 'Labal'
-  if rip_operand:
-    result = [arg.replace('Memory', 'Label') for arg in result]
-  print('  EmitInstruction<Opcodes<%s>>(%s);' % (
-      ', '.join('0x%02x' % int(opcode, 16) for opcode in insn['opcodes']),
-      ', '.join(result)), file=f)
+  if result == sorted(result):
+    return None
+  return tuple(result)
+
+
+# Operand fields (and their types) passed separately for each addressing mode.
+# Absolute addressing only passes displacement and is handled separately.
+_MEM_ADDR_MODE_ARGS = {
+    'BaseDisp': (('Register', 'base'), ('int32_t', 'disp')),
+    'IndexDisp': (('Register', 'index'),
+                  ('ScaleFactor', 'scale'),
+                  ('int32_t', 'disp')),
+    'BaseIndexDisp': (('Register', 'base'),
+                      ('Register', 'index'),
+                      ('ScaleFactor', 'scale'),
+                      ('int32_t', 'disp')),
+}
 
 
-def _gen_memory_function_specializations_h(f, insns):
+def _gen_memory_function_specializations_h(out, insns):
+  is_implicit_reg = asm_defs.is_implicit_reg
   for insn in insns:
     # Only build additional definitions needed for memory access in LIR if there
     # are memory arguments and instruction is intended for use in LIR
-    if not _contains_mem(insn) or insn.get('skip_lir'):
+    if not insn['_contains_mem'] or insn.get('skip_lir'):
       continue
-    template, _ = _get_template_name(insn)
-    params = _get_params(insn)
+    template = insn['_template']
+    asm = insn['asm']
+    args = insn['args']
     for addr_mode in ('Absolute', 'BaseDisp', 'IndexDisp', 'BaseIndexDisp'):
       # Generate a function to expand a macro and emit a corresponding
       # assembly instruction with a memory operand.
       macro_name = asm_defs.get_mem_macro_name(insn, addr_mode)
       incoming_args = []
       outgoing_args = []
-      for i, arg in enumerate(insn.get('args')):
-        if asm_defs.is_implicit_reg(arg.get('class')):
+      for i, arg in enumerate(args):
+        if is_implicit_reg(arg['class']):
           continue
         arg_name = 'arg%d' % (i)
-        if asm_defs.is_mem_op(arg.get('class')):
+        type_name = arg['_type_name']
+        if type_name == 'const Operand&':
           if addr_mode == 'Absolute':
             incoming_args.append('int32_t %s' % (arg_name))
             outgoing_args.append('{.disp = %s}' % (arg_name))
             continue
-          mem_args = []
-          if addr_mode in ('BaseDisp', 'BaseIndexDisp'):
-            mem_args.append(['Register', 'base', arg_name + '_base'])
-          if addr_mode in ('IndexDisp', 'BaseIndexDisp'):
-            mem_args.append(['Register', 'index', arg_name + '_index'])
-            mem_args.append(['ScaleFactor', 'scale', arg_name + '_scale'])
-          mem_args.append(['int32_t', 'disp', arg_name + '_disp'])
-          incoming_args.extend(['%s %s' % (pair[0], pair[2]) for pair in mem_args])
-          outgoing_args.append('{%s}' % (
-              ', '.join(['.%s = %s' % (pair[1], pair[2]) for pair in mem_args])))
+          mem_args = _MEM_ADDR_MODE_ARGS[addr_mode]
+          incoming_args.extend(
+              '%s %s_%s' % (arg_type, arg_name, field) for arg_type, field in mem_args)
+          outgoing_args.append('{%s}' % ', '.join(
+              '.%s = %s_%s' % (field, arg_name, field) for _, field in mem_args))
         else:
-          incoming_args.append('%s %s' % (_get_arg_type_name(arg), arg_name))
+          incoming_args.append('%s %s' % (type_name, arg_name))
           outgoing_args.append(arg_name)
       if template:
-        print(template, file=f)
-      print('void %s(%s) {' % (macro_name, ', '.join(incoming_args)), file=f)
-      print('  %s(%s);' % (insn.get('asm'), ', '.join(outgoing_args)), file=f)
-      print('}', file=f)
+        out.append(template)
+      out.append('void %s(%s) {' % (macro_name, ', '.join(incoming_args)))
+      out.append('  %s(%s);' % (asm, ', '.join(outgoing_args)))
+      out.append('}')
+
+
+def _write_lines(f, lines):
+  # Output is fully assembled in memory: encode it once and pass it to the
+  # binary file in a single write, bypassing text layer buffering.
+  if lines:
+    f.write(('\n'.join(lines) + '\n').encode())
 
 
 def _is_for_asm(insn):
@@ -415,10 +472,48 @@ def _is_for_asm(insn):
   return True
 
 
+def _add_insn_info(insn):
+  # These are needed several times for each instruction: compute them once.
+  # Implicit registers are not passed to assembler, so most generators only
+  # need explicit arguments.
+  insn['_explicit_args'] = _get_explicit_args(insn)
+  insn['_arg_count'] = len(insn['_explicit_args'])
+  insn['_args_key'] = _get_args_key(insn['args'])
+  # Classify each argument once instead of in every generator.
+  for arg in insn['_explicit_args']:
+    arg['_type_name'] = _get_arg_type_name(arg)
+  insn['_template'], insn['_name'] = _get_template_name(insn)
+  insn['_params'] = _get_params(insn)
+  insn['_imm_type'] = _get_immediate_type(insn)
+  insn['_contains_mem'] = _contains_mem(insn)
+  insn['_instruction_args'] = _get_instruction_args(insn)
+  if 'opcodes' in insn:
+    insn['_emit_args'] = _get_emit_args(insn)
+    insn['_shortcut_flags'] = _get_shortcut_flags(insn)
+    insn['_opcodes'] = ', '.join(
+        _OPCODE_LITERALS.get(opcode) or '0x%02x' % int(opcode, 16)
+        for opcode in insn['opcodes'])
+
+
 def _load_asm_defs(asm_def):
   _, insns = asm_defs.load_asm_defs(asm_def)
-  # Filter out explicitly disabled instructions.
-  return [i for i in insns if _is_for_asm(i)]
+  result = []
+  for insn in insns:
+    # Filter out explicitly disabled instructions.
+    if _is_for_asm(insn):
+      _add_insn_info(insn)
+      result.append(insn)
+  return result
+
+
+def _gen_file(out_filename, input_filename, binary_assembler):
+  loaded_defs = _load_asm_defs(input_filename)
+  out = []
+  _gen_generic_functions_h(out, loaded_defs, binary_assembler)
+  if binary_assembler:
+    _gen_memory_function_specializations_h(out, loaded_defs)
+  with open(out_filename, 'wb') as out_file:
+    _write_lines(out_file, out)
 
 
 def main(argv):
@@ -433,8 +528,8 @@ def main(argv):
   mode = argv[1]
   assert len(argv) % 2 == 0
   filenames = argv[2:]
-  filename_pairs = ((filenames[i], filenames[len(filenames)//2 + i])
-                    for i in range(0, len(filenames)//2))
+  out_filenames = filenames[:len(filenames)//2]
+  input_filenames = filenames[len(filenames)//2:]
 
   if mode == '--binary-assembler':
     binary_assembler = True
@@ -443,12 +538,17 @@ def main(argv):
   else:
     assert False, 'unknown option %s' % (mode)
 
-  for out_filename, input_filename in filename_pairs:
-    loaded_defs = _load_asm_defs(input_filename)
-    with open(out_filename, 'w') as out_file:
-      _gen_generic_functions_h(out_file, loaded_defs, binary_assembler)
-      if binary_assembler:
-        _gen_memory_function_specializations_h(out_file, loaded_defs)
+  # Files are independent, generate them in parallel if that's possible.
+  workers = min(len(out_filenames), os.cpu_count() or 1)
+  if workers <= 1:
+    for out_filename, input_filename in zip(out_filenames, input_filenames):
+      _gen_file(out_filename, input_filename, binary_assembler)
+  else:
+    with concurrent.futures.ProcessPoolExecutor(workers) as executor:
+      list(executor.map(_gen_file,
+                        out_filenames,
+                        input_filenames,
+                        [binary_assembler] * len(out_filenames)))
 
 if __name__ == '__main__':
   sys.exit(main(sys.argv))
@@ -75,9 +75,30 @@ def main(argv):
   #                        ...
   #                        <def>
   #                        ...
+  #   gen_lir.py --both <insn-inl.h>
+  #                     <machine_info-inl.h>
+  #                     <machine_opcode-inl.h>
+  #                     <machine_ir-inl.h>
+  #                     <code_emit.cc>
+  #                     <code_debug.cc>
+  #                     <lir_instructions.json>
+  #                     ...
+  #                     <machine_ir_intrinsic_binding.json>
+  #                     ...
+  #                     <def>
+  #                     ...
+  # --both produces outputs of --headers and --sources while only loading
+  # definitions once.
 
   mode = argv[1]
-  lir_def_files_begin = 6 if mode == '--headers' else 4
+  if mode == '--headers':
+    lir_def_files_begin = 6
+  elif mode == '--sources':
+    lir_def_files_begin = 4
+  elif mode == '--both':
+    lir_def_files_begin = 8
+  else:
+    assert False, 'unknown option %s' % (mode)
   lir_def_files_end = lir_def_files_begin
   while argv[lir_def_files_end].endswith('lir_instructions.json'):
     lir_def_files_end += 1
@@ -85,24 +106,18 @@ def main(argv):
   while argv[arch_def_files_end].endswith('machine_ir_intrinsic_binding.json'):
     arch_def_files_end += 1
 
-  if mode == '--headers':
-    arch, insns = gen_lir_lib.load_all_lir_defs(
-      argv[lir_def_files_begin:lir_def_files_end],
-      argv[lir_def_files_end:arch_def_files_end],
-      argv[arch_def_files_end:])
-    gen_lir_lib.gen_code_2_cc(argv[2], arch, insns)
-    gen_lir_lib.gen_machine_info_h(argv[3], arch, insns)
-    gen_lir_lib.gen_machine_opcode_h(argv[4], arch, insns)
-    gen_lir_lib.gen_machine_ir_h(argv[5], arch, insns)
-  elif mode == '--sources':
-    arch, insns = gen_lir_lib.load_all_lir_defs(
-      argv[lir_def_files_begin:lir_def_files_end],
-      argv[lir_def_files_end:arch_def_files_end],
-      argv[arch_def_files_end:])
+  arch, insns = gen_lir_lib.load_all_lir_defs(
+    argv[lir_def_files_begin:lir_def_files_end],
+    argv[lir_def_files_end:arch_def_files_end],
+    argv[arch_def_files_end:])
+  if mode in ('--headers', '--both'):
+    gen_lir_lib.gen_headers(argv[2], argv[3], argv[4], argv[5], arch, insns)
+  if mode == '--sources':
     gen_lir_lib.gen_code_emit_cc(argv[2], arch, insns)
     gen_lir_lib.gen_code_debug_cc(argv[3], arch, insns)
-  else:
-    assert False, 'unknown option %s' % (mode)
+  elif mode == '--both':
+    gen_lir_lib.gen_code_emit_cc(argv[6], arch, insns)
+    gen_lir_lib.gen_code_debug_cc(argv[7], arch, insns)
 
   return 0
 
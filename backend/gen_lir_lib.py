@@ -53,136 +53,164 @@ describe scratch operands as output-only-early-clobber.
 """
 
 import asm_defs
-import json
+import collections
+import functools
 import sys
 
 
-def _is_reg(arg_type):
-  return (asm_defs.is_greg(arg_type) or
-          asm_defs.is_xreg(arg_type) or
-          asm_defs.is_implicit_reg(arg_type))
+# Addressing modes of memory operand supported in LIR.
+# The order of the addressing modes here is important.  It must match what
+# MemInsns expects.
+_ADDR_MODES = ('Absolute', 'BaseDisp', 'IndexDisp', 'BaseIndexDisp')
 
+_ADDR_MODE_INDEXES = {addr_mode: i for i, addr_mode in enumerate(_ADDR_MODES)}
 
-class Operand(object):
-  pass
+# Whether memory operand has base and index registers, per addressing mode.
+_ADDR_MODE_REGS = {
+    'Absolute': (False, False),
+    'BaseDisp': (True, False),
+    'IndexDisp': (False, True),
+    'BaseIndexDisp': (True, True),
+}
+
+# Operand classes supported in LIR, as returned by _classify.
+(_GREG, _XREG, _IMPLICIT_REG, _IMM, _MEM_OP, _DISP, _COND, _LABEL) = range(8)
+
+_REG_CLASSES = (_GREG, _XREG, _IMPLICIT_REG)
+
+
+# There are only few dozens of argument kinds, cache the result.
+@functools.lru_cache(maxsize=None)
+def _classify(kind):
+  if asm_defs.is_greg(kind):
+    return _GREG
+  if asm_defs.is_xreg(kind):
+    return _XREG
+  if asm_defs.is_implicit_reg(kind):
+    return _IMPLICIT_REG
+  if asm_defs.is_imm(kind):
+    return _IMM
+  if asm_defs.is_mem_op(kind):
+    return _MEM_OP
+  if asm_defs.is_disp(kind):
+    return _DISP
+  if asm_defs.is_cond(kind):
+    return _COND
+  if asm_defs.is_label(kind):
+    return _LABEL
+  # Not supported in LIR.
+  return None
+
+
+Operand = collections.namedtuple(
+    'Operand', ('type', 'name', 'reg_operand_info', 'initializer', 'asm_arg'))
+
+
+_USAGE_TO_MACHINE_REG_KIND = {
+    'use': 'kUse',
+    'def': 'kDef',
+    'use_def': 'kUseDef',
+    'def_early_clobber': 'kDefEarlyClobber',
+}
 
 
 def _get_reg_operand_info(usage, kind):
-  if usage == 'use':
-    return '{ &k%s, MachineRegKind::kUse }' % (kind)
-  if usage == 'def':
-    return '{ &k%s, MachineRegKind::kDef }' % (kind)
-  if usage == 'use_def':
-    return '{ &k%s, MachineRegKind::kUseDef }' % (kind)
-  if usage == 'def_early_clobber':
-    return '{ &k%s, MachineRegKind::kDefEarlyClobber }' % (kind)
-  assert False, 'unknown operand usage %s' % (usage)
+  assert usage in _USAGE_TO_MACHINE_REG_KIND, 'unknown operand usage %s' % (usage)
+  return '{ &k%s, MachineRegKind::%s }' % (kind, _USAGE_TO_MACHINE_REG_KIND[usage])
+
+
+# Function to get assembler register, implicit registers are not passed to
+# assembler.
+_REG_ASM_GETTERS = {
+    _GREG: 'GetGReg',
+    _XREG: 'GetXReg',
+    _IMPLICIT_REG: None,
+}
 
 
 def _make_reg_operand(r, usage, kind):
-   op = Operand()
-   op.type = 'MachineReg'
-   op.name = 'r%d' % (r)
-   op.reg_operand_info = _get_reg_operand_info(usage, kind)
-   op.initializer = 'SetRegAt(%d, r%d)' % (r, r)
-   if asm_defs.is_greg(kind):
-     op.asm_arg = 'GetGReg(RegAt(%d))' % (r)
-   elif asm_defs.is_xreg(kind):
-     op.asm_arg = 'GetXReg(RegAt(%d))' % (r)
-   elif asm_defs.is_implicit_reg(kind):
-     op.asm_arg = None
+   cls = _classify(kind)
+   assert cls in _REG_ASM_GETTERS, 'unknown register kind %s' % (kind)
+   asm_getter = _REG_ASM_GETTERS[cls]
+   if asm_getter:
+     asm_arg = '%s(RegAt(%d))' % (asm_getter, r)
    else:
-     assert False, 'unknown register kind %s' % (kind)
-   return op
+     asm_arg = None
+   return Operand(type='MachineReg',
+                  name='r%d' % (r),
+                  reg_operand_info=_get_reg_operand_info(usage, kind),
+                  initializer='SetRegAt(%d, r%d)' % (r, r),
+                  asm_arg=asm_arg)
 
 
 def _make_imm_operand(bits):
-  op = Operand()
-  op.type = 'int%s_t' % (bits)
-  op.name = 'imm'
-  op.reg_operand_info = None
-  op.initializer = 'set_imm(imm)'
-  op.asm_arg = 'static_cast<%s>(imm())' % (op.type)
-  return op
+  op_type = 'int%s_t' % (bits)
+  return Operand(type=op_type,
+                 name='imm',
+                 reg_operand_info=None,
+                 initializer='set_imm(imm)',
+                 asm_arg='static_cast<%s>(imm())' % (op_type))
 
 
 def _make_scale_operand():
-  op = Operand()
-  op.type = 'MachineMemOperandScale'
-  op.name = 'scale'
-  op.reg_operand_info = None
-  op.initializer = 'set_scale(scale)'
-  op.asm_arg = 'ToScaleFactor(scale())'
-  return op
+  return Operand(type='MachineMemOperandScale',
+                 name='scale',
+                 reg_operand_info=None,
+                 initializer='set_scale(scale)',
+                 asm_arg='ToScaleFactor(scale())')
 
 
 def _make_disp_operand():
-  op = Operand()
-  op.type = 'uint32_t'
-  op.name = 'disp'
-  op.reg_operand_info = None
-  op.initializer = 'set_disp(disp)'
-  op.asm_arg = 'disp()'
-  return op
+  return Operand(type='uint32_t',
+                 name='disp',
+                 reg_operand_info=None,
+                 initializer='set_disp(disp)',
+                 asm_arg='disp()')
 
 
 def _make_cond_operand():
-  op = Operand()
-  op.type = 'Assembler::Condition'
-  op.name = 'cond'
-  op.reg_operand_info = None
-  op.initializer = 'set_cond(cond)'
-  op.asm_arg = 'cond()'
-  return op
+  return Operand(type='Assembler::Condition',
+                 name='cond',
+                 reg_operand_info=None,
+                 initializer='set_cond(cond)',
+                 asm_arg='cond()')
 
 
 def _make_label_operand():
-  op = Operand()
   # We never have both immediate and Label in same insn.
-  op.type = 'Label*'
-  op.name = 'label'
-  op.reg_operand_info = None
-  op.initializer = 'set_imm(reinterpret_cast<uintptr_t>(label))'
-  op.asm_arg = '*reinterpret_cast<Label*>(imm())'
-  return op
-
-
-def _check_insn_defs(insn, skip_unsupported=False):
-  seen_imm = False
-  seen_memop = False
-  seen_disp = False
-  for arg in insn.get('args'):
-    kind = arg.get('class')
-    if _is_reg(kind):
-      pass
-    elif asm_defs.is_imm(kind):
-      # We share field for immediate and label in 'insn'.
-      assert not seen_imm
-      seen_imm = True
-    elif asm_defs.is_mem_op(kind):
-      # No insn can have more than one memop.
-      assert not seen_memop
-      addr_mode = insn.get('addr_mode')
-      if skip_unsupported:
-        if addr_mode not in ('Absolute', 'BaseDisp', 'IndexDisp', 'BaseIndexDisp'):
-          return False
-      assert addr_mode in ('Absolute', 'BaseDisp', 'IndexDisp', 'BaseIndexDisp'), \
-        'unknown addressing mode %s' % (addr_mode)
-      seen_memop = True
-    elif asm_defs.is_disp(kind):
-      assert not seen_disp
-      seen_disp = True
-    elif asm_defs.is_cond(kind):
-      pass
-    elif asm_defs.is_label(kind):
-      assert not seen_imm
-      seen_imm = True
-    else:
-      assert False, 'unknown operand class %s' % (kind)
-  return True
+  return Operand(type='Label*',
+                 name='label',
+                 reg_operand_info=None,
+                 initializer='set_imm(reinterpret_cast<uintptr_t>(label))',
+                 asm_arg='*reinterpret_cast<Label*>(imm())')
+
+
+def _has_supported_addr_mode(insn):
+  # Only these addressing modes of memory operand are supported in LIR.
+  return (not _contains_mem(insn) or
+          insn.get('addr_mode') in _ADDR_MODES)
+
+
+def _classify_args(insn):
+  # Each argument is classified once, for both _get_operands and
+  # _get_debug_operands.
+  return tuple((_classify(arg['class']), arg['class'], arg.get('usage'))
+               for arg in insn['args'])
+
 
+# Operands which insn can have at most one of, grouped by bits.
+_UNIQUE_OPERAND_BITS = {
+    # We share field for immediate and label in 'insn'.
+    _IMM: 1,
+    _LABEL: 1,
+    # No insn can have more than one memop.
+    _MEM_OP: 2,
+    _DISP: 4,
+}
 
-def _get_insn_operands(insn):
+
+# Returned operands are shared by all generators and must not be modified.
+def _get_operands(name, addr_mode, args):
   """For each operand, define:
   - type
   - name
@@ -190,168 +218,177 @@ def _get_insn_operands(insn):
   - initializer
   - asm_arg
   """
+  # Operands are built exactly once for each insn, so this also checks that
+  # insn definition is valid.
   res = []
   r = 0
+  seen = 0
   # Int3, Mfence, and UD2 have side effects not related to arguments.
-  side_effects = insn['name'] in ('Int3', 'Mfence', 'UD2')
-  for arg in insn.get('args'):
-    kind = arg.get('class')
-    if _is_reg(kind):
-      res.append(_make_reg_operand(r, arg.get('usage'), kind))
+  side_effects = name in ('Int3', 'Mfence', 'UD2')
+  for cls, kind, usage in args:
+    unique_bit = _UNIQUE_OPERAND_BITS.get(cls, 0)
+    assert not seen & unique_bit, 'duplicate operand %s' % (kind)
+    seen |= unique_bit
+    if cls in _REG_CLASSES:
+      res.append(_make_reg_operand(r, usage, kind))
       r += 1
-    elif asm_defs.is_imm(kind):
-      # We share field for immediate and label in 'insn'.
+    elif cls == _IMM:
       bits = kind[3:]
       res.append(_make_imm_operand(bits))
-    elif asm_defs.is_mem_op(kind):
+    elif cls == _MEM_OP:
       # If operand is memory and it's not "use" then we have side_effects
-      if arg['usage'] != 'use':
+      if usage != 'use':
         side_effects = True
-      # No insn can have more than one memop.
-      addr_mode = insn.get('addr_mode')
-      assert addr_mode in ('Absolute', 'BaseDisp', 'IndexDisp', 'BaseIndexDisp'), \
+      assert addr_mode in _ADDR_MODE_REGS, \
         'unknown addressing mode %s' % (addr_mode)
-      if addr_mode in ('BaseDisp', 'BaseIndexDisp'):
+      has_base, has_index = _ADDR_MODE_REGS[addr_mode]
+      if has_base:
         res.append(_make_reg_operand(r, 'use', 'GeneralReg32'))
         r += 1
 
-      if addr_mode in ('IndexDisp', 'BaseIndexDisp'):
+      if has_index:
         res.append(_make_reg_operand(r, 'use', 'GeneralReg32'))
         r += 1
         res.append(_make_scale_operand())
 
       res.append(_make_disp_operand())
-    elif asm_defs.is_disp(kind):
+    elif cls == _DISP:
       res.append(_make_disp_operand())
-    elif asm_defs.is_cond(kind):
+    elif cls == _COND:
       res.append(_make_cond_operand())
-    elif asm_defs.is_label(kind):
+    elif cls == _LABEL:
       res.append(_make_label_operand())
     else:
       assert False, 'unknown operand class %s' % (kind)
-  return res, side_effects
+  return tuple(res), side_effects
 
 
-def _get_insn_debug_operands(insn):
+def _get_debug_operands(addr_mode, args):
   res = []
   r = 0
-  for arg in insn.get('args'):
-    kind = arg.get('class')
-    if _is_reg(kind):
-      if asm_defs.is_greg(kind) or asm_defs.is_xreg(kind):
-        res.append('GetRegOperandDebugString(this, %d)' % (r))
-      elif asm_defs.is_implicit_reg(kind):
-        res.append('GetImplicitRegOperandDebugString(this, %d)' % (r))
-      else:
-        assert False, 'unknown register kind %s' % (kind)
+  for cls, kind, _ in args:
+    if cls in (_GREG, _XREG):
+      res.append('GetRegOperandDebugString(this, %d)' % (r))
+      r += 1
+    elif cls == _IMPLICIT_REG:
+      res.append('GetImplicitRegOperandDebugString(this, %d)' % (r))
       r += 1
-    elif asm_defs.is_imm(kind):
+    elif cls == _IMM:
       # We share field for immediate and label in 'insn'.
       res.append('GetImmOperandDebugString(this)')
-    elif asm_defs.is_mem_op(kind):
+    elif cls == _MEM_OP:
       # No insn can have more than one memop.
-      addr_mode = insn.get('addr_mode')
       if addr_mode == 'Absolute':
         res.append('GetAbsoluteMemOperandDebugString(this)')
-      elif addr_mode in ('BaseDisp', 'IndexDisp', 'BaseIndexDisp'):
+      elif addr_mode in _ADDR_MODE_REGS:
         res.append('Get%sMemOperandDebugString(this, %d)' % (addr_mode, r))
-        r += {'BaseDisp': 1, 'IndexDisp': 1, 'BaseIndexDisp': 2}[addr_mode]
+        has_base, has_index = _ADDR_MODE_REGS[addr_mode]
+        r += has_base + has_index
       else:
         assert False, 'unknown addr_mode %s' % (addr_mode)
-    elif asm_defs.is_disp(kind):
+    elif cls == _DISP:
       # Hack: replace previous reg helper with mem helper.
       assert res
       assert res[-1].startswith('GetRegOperandDebugString')
       res[-1] = 'GetBaseDispMemOperandDebugString' + res[-1][24:]
-    elif asm_defs.is_cond(kind):
+    elif cls == _COND:
       res.append('GetCondOperandDebugString(this)')
-    elif asm_defs.is_label(kind):
+    elif cls == _LABEL:
       res.append('GetLabelOperandDebugString(this)')
     else:
       assert False, 'unknown operand class %s' % (kind)
-  return res
+  return tuple(res)
 
 
 INDENT = '  '
 
 
-def _gen_insn_ctor(f, insn):
-  name = insn.get('name')
-  operands, _ = _get_insn_operands(insn)
-  params = ['%s %s' % (op.type, op.name) for op in operands]
-  inits = ['%s%s;' % (INDENT, op.initializer) for op in operands]
-  print('constexpr MachineInsnInfo %s::kInfo;' % (name), file=f)
-  print('%s::%s(%s) : MachineInsnForArch(&kInfo) {' % (name, name, ', '.join(params)), file=f)
-  print('\n'.join(inits), file=f)
-  print('}', file=f)
+def _gen_insn_ctor(lines, insn):
+  name = insn['name']
+  inits = ['%s%s;' % (INDENT, op.initializer) for op in insn['_operands']]
+  lines.append('constexpr MachineInsnInfo %s::kInfo;' % (name))
+  lines.append('%s::%s(%s) : MachineInsnForArch(&kInfo) {' % (name, name, insn['_params']))
+  lines.append('\n'.join(inits))
+  lines.append('}')
 
 
 # TODO(b/232598137): Maybe we should just implement generic printing in C++
 # instead of generating it for every instruction.
-def _gen_insn_debug(f, insn):
-  name = insn.get('name')
+_DEBUG_OPERAND_SEPARATOR = ';\n  s += ", ";\n  s += '
+
+# We don't print recovery_bb() since it can be found by edges outgoing from basic block.
+_DEBUG_STRING_TAIL = """\
+  if (recovery_pc()) {
+    s += StringPrintf(" <0x%" PRIxPTR ">", recovery_pc());
+  }
+  return s;"""
+
+
+def _gen_insn_debug(lines, insn):
+  name = insn['name']
   mnemo = insn.get('mnemo')
-  print('std::string %s::GetDebugString() const {' % (name), file=f)
-  operands = _get_insn_debug_operands(insn)
+  lines.append('std::string %s::GetDebugString() const {' % (name))
+  operands = insn['_debug_operands']
   if not operands:
-    print('  return "%s";' % (mnemo), file=f)
+    lines.append('  return "%s";' % (mnemo))
   else:
-    print('  std::string s("%s ");' % (mnemo), file=f)
-    print('  s += %s;' % (operands[0]), file=f)
-    for op in operands[1:]:
-      print('  s += ", ";', file=f)
-      print('  s += %s;' % (op), file=f)
-    # We don't print recovery_bb() since it can be found by edges outgoing from basic block.
-    print('  if (recovery_pc()) {', file=f)
-    print('    s += StringPrintf(" <0x%" PRIxPTR ">", recovery_pc());', file=f)
-    print('  }', file=f)
-    print('  return s;', file=f)
-  print('}', file=f)
-
-
-def _gen_insn_emit(f, insn):
-  name = insn.get('name')
-  asm = insn.get('asm')
-  operands, _ = _get_insn_operands(insn)
-  asm_args = [op.asm_arg for op in operands if op.asm_arg]
-  print('void %s::Emit(CodeEmitter* as) const {' % (name), file=f)
-  print('%sas->%s(%s);' % (INDENT, asm, ', '.join(asm_args)), file=f)
-  print('}', file=f)
+    lines.append('  std::string s("%s ");' % (mnemo))
+    lines.append('  s += %s;' % (_DEBUG_OPERAND_SEPARATOR.join(operands)))
+    lines.append(_DEBUG_STRING_TAIL)
+  lines.append('}')
 
 
-def _gen_insn_class(f, insn):
-  name = insn.get('name')
-  operands, side_effects = _get_insn_operands(insn)
+def _gen_insn_emit(lines, insn):
+  name = insn['name']
+  asm = insn['asm']
+  operands = insn['_operands']
+  asm_args = [op.asm_arg for op in operands if op.asm_arg]
+  lines.append('void %s::Emit(CodeEmitter* as) const {' % (name))
+  lines.append('%sas->%s(%s);' % (INDENT, asm, ', '.join(asm_args)))
+  lines.append('}')
+
+
+_INSN_CLASS_TEMPLATE = """\
+class %(name)s : public MachineInsnForArch {
+ public:
+  explicit %(name)s(%(params)s);
+  static constexpr MachineInsnInfo kInfo =
+      MachineInsnInfo({kMachineOp%(name)s,
+                       %(num_regs)d,
+                       {%(regs)s},
+                       %(kind)s});
+  static constexpr int NumRegOperands() { return kInfo.num_reg_operands; }
+  static constexpr const MachineRegKind& RegKindAt(int i) { return kInfo.reg_kinds[i]; }
+  std::string GetDebugString() const override;
+  void Emit(CodeEmitter* as) const override;
+};"""
+
+
+def _gen_insn_class(lines, insn):
+  name = insn['name']
+  operands = insn['_operands']
   regs = [op.reg_operand_info for op in operands if op.reg_operand_info]
-  if side_effects:
+  if insn['_side_effects']:
     kind = 'kMachineInsnSideEffects'
   else:
     kind = 'kMachineInsnDefault'
-  params = ['%s %s' % (op.type, op.name) for op in operands]
-  print('class %s : public MachineInsnForArch {' % (name), file=f)
-  print(' public:', file=f)
-  print('  explicit %s(%s);' % (name, ', '.join(params)), file=f)
-  print('  static constexpr MachineInsnInfo kInfo =', file=f)
-  print('      MachineInsnInfo({kMachineOp%s,' % (name), file=f)
-  print('                       %d,' % (len(regs)), file=f)
-  print('                       {%s},' % (', '.join(regs)), file=f)
-  print('                       %s});' % (kind), file=f)
-  print('  static constexpr int NumRegOperands() { return kInfo.num_reg_operands; }', file=f)
-  print('  static constexpr const MachineRegKind& RegKindAt(int i) { return kInfo.reg_kinds[i]; }', file=f)
-  print('  std::string GetDebugString() const override;', file=f)
-  print('  void Emit(CodeEmitter* as) const override;', file=f)
-  print('};', file=f)
-
-
-def gen_code_2_cc(out, arch, insns):
+  lines.append(_INSN_CLASS_TEMPLATE % {
+      'name': name,
+      'params': insn['_params'],
+      'num_regs': len(regs),
+      'regs': ', '.join(regs),
+      'kind': kind})
+
+
+def _write_lines(out, lines):
   with open(out, 'w') as f:
-    for insn in insns:
-      _gen_insn_ctor(f, insn)
+    if lines:
+      f.write('\n'.join(lines))
+      f.write('\n')
 
 
 def gen_code_debug_cc(out, arch, insns):
-  with open(out, 'w') as f:
-    print("""\
+  lines = ["""\
 // This file automatically generated by gen_lir.py
 // DO NOT EDIT!
 
@@ -361,19 +398,19 @@ def gen_code_debug_cc(out, arch, insns):
 namespace berberis {
 
 namespace %s {
-""" % (arch, arch), file=f)
-    for insn in insns:
-      _gen_insn_debug(f, insn)
-    print("""\
+""" % (arch, arch)]
+  for insn in insns:
+    _gen_insn_debug(lines, insn)
+  lines.append("""\
 
 }  // namespace %s
 
-}  // namespace berberis""" % (arch), file=f)
+}  // namespace berberis""" % (arch))
+  _write_lines(out, lines)
 
 
 def gen_code_emit_cc(out, arch, insns):
-  with open(out, 'w') as f:
-    print("""\
+  lines = ["""\
 // This file automatically generated by gen_lir.py
 // DO NOT EDIT!
 
@@ -383,112 +420,115 @@ def gen_code_emit_cc(out, arch, insns):
 namespace berberis {
 
 namespace %s {
-""" % (arch, arch), file=f)
-    for insn in insns:
-      _gen_insn_emit(f, insn)
-    print("""\
+""" % (arch, arch)]
+  for insn in insns:
+    _gen_insn_emit(lines, insn)
+  lines.append("""\
 
 }  // namespace %s
 
-}  // namespace berberis""" % (arch), file=f)
-
-
-def gen_machine_info_h(out, arch, insns):
-  with open(out, 'w') as f:
-    for insn in insns:
-      name = insn.get('name')
-      print('using %s = %s;' % (name, name), file=f)
+}  // namespace berberis""" % (arch))
+  _write_lines(out, lines)
 
 
-def gen_machine_opcode_h(out, arch, insns):
-  with open(out, 'w') as f:
-    for insn in insns:
-      name = insn.get('name')
-      print('kMachineOp%s,' % (name), file=f)
-
-
-def _gen_mem_insn_groups(f, insns):
-  # Build a dictionary to map a memory insn group name to another dictionary,
-  # which in turn maps an addressing mode to an individual memory insn.
+def _gen_mem_insn_groups(lines, insns):
+  # Build a dictionary to map a memory insn group name to the list of
+  # individual memory insns, ordered as _ADDR_MODES.
   groups = {}
   for i in insns:
     group_name = i.get('mem_group_name')
     if group_name:
-      groups.setdefault(group_name, {})[i.get('addr_mode')] = i.get('name')
+      mem_insns = groups.setdefault(group_name, [None] * len(_ADDR_MODES))
+      mem_insns[_ADDR_MODE_INDEXES[i['addr_mode']]] = i['name']
 
   for group_name in sorted(groups):
-    # The order of the addressing modes here is important.  It must
-    # match what MemInsns expects.
-    mem_insns = [groups[group_name][addr_mode]
-                 for addr_mode in ('Absolute', 'BaseDisp', 'IndexDisp', 'BaseIndexDisp')]
-    print('using %s = MemInsns<%s>;' % (group_name, ', '.join(mem_insns)), file=f)
+    lines.append('using %s = MemInsns<%s>;' % (group_name, ', '.join(groups[group_name])))
 
 
-def gen_machine_ir_h(out, arch, insns):
-  with open(out, 'w') as f:
-    for insn in insns:
-      _gen_insn_class(f, insn)
-    print('', file=f)
-    _gen_mem_insn_groups(f, insns)
+def gen_headers(code_2_cc_out, machine_info_h_out, machine_opcode_h_out,
+                machine_ir_h_out, arch, insns):
+  # All headers are generated in a single pass over insns.
+  code_2_cc_lines = []
+  machine_info_h_lines = []
+  machine_opcode_h_lines = []
+  machine_ir_h_lines = []
+  for insn in insns:
+    name = insn['name']
+    _gen_insn_ctor(code_2_cc_lines, insn)
+    machine_info_h_lines.append('using %s = %s;' % (name, name))
+    machine_opcode_h_lines.append('kMachineOp%s,' % (name))
+    _gen_insn_class(machine_ir_h_lines, insn)
+  machine_ir_h_lines.append('')
+  _gen_mem_insn_groups(machine_ir_h_lines, insns)
+  _write_lines(code_2_cc_out, code_2_cc_lines)
+  _write_lines(machine_info_h_out, machine_info_h_lines)
+  _write_lines(machine_opcode_h_out, machine_opcode_h_lines)
+  _write_lines(machine_ir_h_out, machine_ir_h_lines)
 
 
 def _contains_mem(insn):
-  return any(asm_defs.is_mem_op(arg['class']) for arg in insn.get('args'))
+  return any(_classify(arg['class']) == _MEM_OP for arg in insn['args'])
 
 
-def _create_mem_insn(insn, addr_mode):
-  new_insn = insn.copy()
+def _create_mem_insn(insn, addr_mode, mem_group_name):
   macro_name = asm_defs.get_mem_macro_name(insn, addr_mode)
-  new_insn['name'] = macro_name
-  new_insn['addr_mode'] = addr_mode
-  new_insn['asm'] = macro_name
-  new_insn['mem_group_name'] = asm_defs.get_mem_macro_name(insn, '') + 'Insns'
-  return new_insn
+  return {**insn,
+          'name': macro_name,
+          'addr_mode': addr_mode,
+          'asm': macro_name,
+          'mem_group_name': mem_group_name}
 
 
-def _expand_mem_insns(insns):
-  result = []
+def _expand_mem_insns(insns, allowlist):
   for insn in insns:
+    # Memory insns of groups which are not in allowlist would be filtered out
+    # anyway, don't create them.
     if _contains_mem(insn):
-      result.extend([_create_mem_insn(insn, addr_mode)
-                     for addr_mode in ('Absolute', 'BaseDisp', 'IndexDisp', 'BaseIndexDisp')])
-    result.append(insn)
-  return result
+      mem_group_name = asm_defs.get_mem_macro_name(insn, '') + 'Insns'
+      if mem_group_name in allowlist:
+        for addr_mode in _ADDR_MODES:
+          yield _create_mem_insn(insn, addr_mode, mem_group_name)
+    yield insn
 
 
 def _load_lir_def(allowlist_looked, allowlist_found, asm_def):
   arch, insns = asm_defs.load_asm_defs(asm_def)
-  insns = _expand_mem_insns(insns)
-  # Mark all instructions to remove and remember instructions we kept
-  for insn in insns:
-    insn_name = insn.get('mem_group_name', insn['name'])
-    if insn_name in allowlist_looked:
-      allowlist_found.add(insn_name)
-    else:
-      insn['skip_lir'] = 1
-  # Filter out disabled instructions.
-  insns = [i for i in insns if not i.get('skip_lir')]
-  return arch, insns
+  insns = list(_expand_mem_insns(insns, allowlist_looked))
+  # Memory insns are allowlisted by their group name.
+  insn_names = [insn.get('mem_group_name', insn['name']) for insn in insns]
+  # Remember instructions we kept and filter out the rest, as well as
+  # disabled instructions.
+  allowlist_found.update(allowlist_looked.intersection(insn_names))
+  return arch, [insn for insn, insn_name in zip(insns, insn_names)
+                if insn_name in allowlist_looked and not insn.get('skip_lir')]
 
 
 def _allowlist_instructions(allowlist_files, machine_ir_intrinsic_binding_files):
   allowlisted_names = set()
   for allowlist_file in allowlist_files:
-    with open(allowlist_file) as allowlist_json:
-      for insn_name in json.load(allowlist_json)['insns']:
-        allowlisted_names.add(insn_name)
+    allowlisted_names.update(asm_defs.load_json(allowlist_file)['insns'])
   for machine_ir_intrinsic_binding_file in machine_ir_intrinsic_binding_files:
-    with open(machine_ir_intrinsic_binding_file) as machine_ir_intrinsic_binding_json:
-      json_array = json.load(machine_ir_intrinsic_binding_json)
-        # insn of type str is actually part of the file license.
-      while isinstance(json_array[0], str):
-        json_array.pop(0)
-      for insn in json_array:
-        if insn.get('usage', '') != 'interpret-only':
-          allowlisted_names.add(insn['insn'])
+    for insn in asm_defs.load_json(machine_ir_intrinsic_binding_file):
+      # insn of type str is actually part of the file license.
+      if isinstance(insn, str):
+        continue
+      if insn.get('usage', '') != 'interpret-only':
+        allowlisted_names.add(insn['insn'])
   return allowlisted_names
 
 
+def _add_insn_info(insn):
+  # Operands are used by several generators for each insn: compute them once.
+  addr_mode = insn.get('addr_mode')
+  args = _classify_args(insn)
+  insn['_operands'], insn['_side_effects'] = _get_operands(
+      insn['name'], addr_mode, args)
+  insn['_debug_operands'] = _get_debug_operands(addr_mode, args)
+  # Constructor parameters are both declared and defined.
+  insn['_params'] = ', '.join(
+      ['%s %s' % (op.type, op.name) for op in insn['_operands']])
+
+
 def load_all_lir_defs(allowlist_files, machine_ir_intrinsic_binding_files, lir_defs):
   allowlist_looked = _allowlist_instructions(
       allowlist_files, machine_ir_intrinsic_binding_files)
@@ -506,9 +546,10 @@ def load_all_lir_defs(allowlist_files, machine_ir_intrinsic_binding_files, lir_d
       macro_insns.extend(def_insns)
     else:
       insns.extend(def_insns)
-  for insn in insns:
-    _check_insn_defs(insn)
   # Some macroinstructions can only be used in Lite translator for now. Ignore them here.
-  insns.extend(insn for insn in macro_insns if _check_insn_defs(insn, True))
+  insns.extend(insn for insn in macro_insns if _has_supported_addr_mode(insn))
   assert allowlist_looked == allowlist_found
+  # Insn definitions are checked while their operands are built.
+  for insn in insns:
+    _add_insn_info(insn)
   return arch, insns
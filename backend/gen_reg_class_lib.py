@@ -17,23 +17,26 @@
 """Generate machine IR register class definitions from data file."""
 
 def gen_machine_reg_class_inc(f, reg_classes):
+  lines = []
   for reg_class in reg_classes:
     name = reg_class.get('name')
     regs = reg_class.get('regs')
-    print('inline constexpr uint64_t k%sMask =' % (name), file=f)
-    for r in regs[: -1]:
-      print('    (1ULL << kMachineReg%s.reg()) |' % (r), file=f)
-    print('    (1ULL << kMachineReg%s.reg());' % (regs[-1]), file=f)
-    print('inline constexpr MachineRegClass k%s = {' % (name), file=f)
-    print('    "%s",' % (name), file=f)
-    print('    %d,' % (reg_class.get('size')), file=f)
-    print('    k%sMask,' % (name), file=f)
-    print('    %d,' % (len(regs)), file=f)
-    print('    {', file=f)
-    for r in regs:
-      print('      kMachineReg%s,' % (r), file=f)
-    print('    }', file=f)
-    print('};', file=f)
+    lines.append('inline constexpr uint64_t k%sMask =' % (name))
+    lines.append(' |\n'.join(
+        '    (1ULL << kMachineReg%s.reg())' % (r) for r in regs) + ';')
+    lines.append('inline constexpr MachineRegClass k%s = {' % (name))
+    lines.append('    "%s",' % (name))
+    lines.append('    %d,' % (reg_class.get('size')))
+    lines.append('    k%sMask,' % (name))
+    lines.append('    %d,' % (len(regs)))
+    lines.append('    {')
+    lines.extend('      kMachineReg%s,' % (r) for r in regs)
+    lines.append('    }')
+    lines.append('};')
+  if lines:
+    # Empty last line makes join() emit the trailing newline too.
+    lines.append('')
+    f.write('\n'.join(lines))
 
 
 def expand_aliases(reg_classes):
@@ -41,6 +44,11 @@ def expand_aliases(reg_classes):
   for reg_class in reg_classes:
     expanded_regs = []
     for r in reg_class.get('regs'):
-      expanded_regs.extend(expanded.get(r, [r]))
+      # Most registers are not aliases, don't create a list for each of them.
+      alias_regs = expanded.get(r)
+      if alias_regs is None:
+        expanded_regs.append(r)
+      else:
+        expanded_regs.extend(alias_regs)
     reg_class['regs'] = expanded_regs
     expanded[reg_class.get('name')] = expanded_regs